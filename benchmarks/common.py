@@ -0,0 +1,212 @@
+# File: benchmarks/common.py
+"""Database, app and output helpers shared by the benchmarks.
+
+Benchmarks run against the MongoDB at BENCHMARK_MONGODB_URL, in the
+BENCHMARK_DB_NAME database, which is dropped before each run. Without a
+URL they fall back to an in-memory mongomock database whose calls wait
+BENCHMARK_ROUND_TRIP_MS, so round trip counts and their latency cost
+still show, but server-side aggregation cost does not.
+"""
+from bson import ObjectId
+from datetime import datetime, timedelta
+from fastapi import FastAPI
+from pymongo import monitoring
+from typing import Dict, List, Optional, Sequence
+import asyncio
+import functools
+import os
+import random
+import threading
+import time
+
+from models.database import get_database
+from routers import auth
+
+BENCHMARK_MONGODB_URL = os.getenv("BENCHMARK_MONGODB_URL")
+BENCHMARK_DB_NAME = os.getenv("BENCHMARK_DB_NAME", "smartbiz_benchmark")
+BENCHMARK_ROUND_TRIP_MS = float(os.getenv("BENCHMARK_ROUND_TRIP_MS", "0.5"))
+
+SEED_BATCH_SIZE = 10_000
+
+class RoundTrips(monitoring.CommandListener):
+    """Counts commands sent to the server; the driver calls this from its own threads"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def started(self, event):
+        with self._lock:
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def _mock_round_trip(method, round_trips: RoundTrips):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        round_trips.started(None)
+        await asyncio.sleep(BENCHMARK_ROUND_TRIP_MS / 1000)
+        return await method(*args, **kwargs)
+    return wrapper
+
+def _mock_cursor_open(method, round_trips: RoundTrips):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        round_trips.started(None)
+        return method(*args, **kwargs)
+    return wrapper
+
+def _mock_first_batch(method):
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        # Only a cursor's first batch is modelled as a round trip
+        if not self.__dict__.get("_benchmark_fetched"):
+            self.__dict__["_benchmark_fetched"] = True
+            await asyncio.sleep(BENCHMARK_ROUND_TRIP_MS / 1000)
+        return await method(self, *args, **kwargs)
+    return wrapper
+
+def _mock_database(round_trips: RoundTrips):
+    from mongomock_motor import AsyncMongoMockClient, AsyncCursor, AsyncCommandCursor, AsyncLatentCommandCursor
+
+    database = AsyncMongoMockClient()[BENCHMARK_DB_NAME]
+    collection = type(database.items)
+    for name in [
+        "bulk_write", "count_documents", "delete_many", "delete_one", "find_one",
+        "find_one_and_update", "insert_many", "insert_one", "update_many", "update_one"
+    ]:
+        setattr(collection, name, _mock_round_trip(getattr(collection, name), round_trips))
+    for name in ["find", "aggregate"]:
+        setattr(collection, name, _mock_cursor_open(getattr(collection, name), round_trips))
+    for cursor in [AsyncCursor, AsyncCommandCursor, AsyncLatentCommandCursor]:
+        for name in ["next", "__anext__", "to_list"]:
+            setattr(cursor, name, _mock_first_batch(getattr(cursor, name)))
+    return database
+
+async def open_database():
+    """(database, round trip counter, description) for a fresh benchmark database"""
+    round_trips = RoundTrips()
+    if not BENCHMARK_MONGODB_URL:
+        return _mock_database(round_trips), round_trips, f"mongomock, {BENCHMARK_ROUND_TRIP_MS} ms per round trip"
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(BENCHMARK_MONGODB_URL, event_listeners=[round_trips])
+    await client.drop_database(BENCHMARK_DB_NAME)
+    database = client[BENCHMARK_DB_NAME]
+    info = await client.server_info()
+    return database, round_trips, f"MongoDB {info['version']} at {BENCHMARK_MONGODB_URL}"
+
+def make_user(role: str = "manager", **fields) -> Dict:
+    return {
+        "_id": ObjectId(),
+        "full_name": f"Benchmark {role.title()}",
+        "id_number": str(random.randint(10_000_000, 99_999_999)),
+        "phone_number": "0712345678",
+        "role": role,
+        "is_active": True,
+        **fields
+    }
+
+def make_app(db, user: Dict, *routers) -> FastAPI:
+    """App with the given routers, bound to db and authenticated as user"""
+    app = FastAPI()
+    for router in routers:
+        app.include_router(router.router)
+
+    async def _database():
+        return db
+
+    async def _user():
+        return user
+
+    app.dependency_overrides[get_database] = _database
+    app.dependency_overrides[auth.get_current_user_from_cookie] = _user
+    app.dependency_overrides[auth.get_manager_user_from_cookie] = _user
+    return app
+
+async def seed_items(db, count: int, current_stock: int) -> List[Dict]:
+    items = [
+        {
+            "_id": ObjectId(),
+            "name": f"Item {i:04d}",
+            "custom_id": f"ITEM{i:04d}",
+            "category": "General",
+            "selling_price": float(10 + i % 90),
+            "buying_price": float(5 + i % 45),
+            "current_stock": current_stock,
+            "alert_threshold": 0,
+            "stock_state": "ok",
+            "supplier_prices": [],
+            "created_at": datetime.utcnow()
+        }
+        for i in range(count)
+    ]
+    await db.items.insert_many(items)
+    return items
+
+async def seed_sales(
+    db,
+    count: int,
+    start: datetime,
+    days: int,
+    items: Sequence[Dict],
+    operator_ids: Sequence[ObjectId],
+    lines_per_sale: int = 3
+) -> int:
+    """Insert count random sales spread evenly over days from start"""
+    rng = random.Random(42)
+    seconds = days * 24 * 3600
+    inserted = 0
+    while inserted < count:
+        batch = []
+        for _ in range(min(SEED_BATCH_SIZE, count - inserted)):
+            lines = []
+            for item in rng.sample(items, lines_per_sale):
+                quantity = rng.randint(1, 5)
+                lines.append({
+                    "item_id": item["_id"],
+                    "item_name": item["name"],
+                    "quantity": quantity,
+                    "unit_price": item["selling_price"],
+                    "unit_cost": item["buying_price"],
+                    "total_price": quantity * item["selling_price"]
+                })
+            total = sum(line["total_price"] for line in lines)
+            batch.append({
+                "items": lines,
+                "total_amount": total,
+                "discount_percentage": 0,
+                "final_amount": total,
+                "payment_method": rng.choice(["cash", "mpesa"]),
+                "processed_by": rng.choice(operator_ids),
+                "created_at": start + timedelta(seconds=rng.randrange(seconds))
+            })
+        await db.sales.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
+
+async def timed(compute, runs: int):
+    """(last result, milliseconds of each run) of awaiting compute() runs times"""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = await compute()
+        durations.append((time.perf_counter() - started) * 1000)
+    return result, durations
+
+def percentile(samples: Sequence[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def print_table(title: str, columns: List[str], rows: List[List], note: Optional[str] = None):
+    print(f"\n{title}" + (f" ({note})" if note else ""))
+    cells = [columns] + [[f"{value:.2f}" if isinstance(value, float) else str(value) for value in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    for index, row in enumerate(cells):
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+        if index == 0:
+            print("  ".join("-" * width for width in widths))
@@ -0,0 +1,78 @@
+# File: benchmarks/group_commit.py
+"""Sale throughput with and without group commit.
+
+Concurrent tills post sales for a while in direct mode, where each request
+commits its own sale, then with the group committer running, which
+flushes queued sales every SALES_GROUP_COMMIT_INTERVAL_MS or
+SALES_GROUP_COMMIT_BATCH_SIZE sales:
+
+    python -m benchmarks.group_commit
+    BENCHMARK_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.group_commit
+"""
+import asyncio
+import httpx
+import os
+import random
+import time
+
+from benchmarks.common import open_database, make_app, make_user, seed_items, percentile, print_table
+from routers import sales
+from services.sales_service import sale_committer, SALES_GROUP_COMMIT_INTERVAL_MS, SALES_GROUP_COMMIT_BATCH_SIZE
+
+BENCHMARK_CONCURRENCY = int(os.getenv("BENCHMARK_CONCURRENCY", "50"))
+BENCHMARK_SALES = int(os.getenv("BENCHMARK_SALES", "2000"))
+BASKET_LINES = 3
+
+async def run_tills(client, items, round_trips):
+    """(sales/sec, round trips/sale, latencies) for BENCHMARK_SALES sales across the tills"""
+    rng = random.Random(7)
+    latencies = []
+    per_till = BENCHMARK_SALES // BENCHMARK_CONCURRENCY
+
+    async def till():
+        for _ in range(per_till):
+            body = {
+                "items": [
+                    {"item_id": str(item["_id"]), "quantity": 1, "unit_price": item["selling_price"]}
+                    for item in rng.sample(items, BASKET_LINES)
+                ],
+                "payment_method": "cash"
+            }
+            started = time.perf_counter()
+            response = await client.post("/sales", json=body)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    before = round_trips.count
+    started = time.perf_counter()
+    await asyncio.gather(*[till() for _ in range(BENCHMARK_CONCURRENCY)])
+    elapsed = time.perf_counter() - started
+    total = per_till * BENCHMARK_CONCURRENCY
+    return total / elapsed, (round_trips.count - before) / total, latencies
+
+async def main():
+    db, round_trips, description = await open_database()
+    items = await seed_items(db, 50, current_stock=10_000_000)
+    app = make_app(db, make_user(), sales)
+
+    rows = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        throughput, trips, latencies = await run_tills(client, items, round_trips)
+        rows.append(["direct", throughput, trips, percentile(latencies, 50), percentile(latencies, 99)])
+
+        sale_committer.start(db)
+        try:
+            throughput, trips, latencies = await run_tills(client, items, round_trips)
+        finally:
+            await sale_committer.stop()
+        rows.append(["group commit", throughput, trips, percentile(latencies, 50), percentile(latencies, 99)])
+
+    print_table(
+        f"{BENCHMARK_CONCURRENCY} tills, {BENCHMARK_SALES} sales of {BASKET_LINES} lines per mode",
+        ["mode", "sales/sec", "round trips/sale", "p50 ms", "p99 ms"],
+        rows,
+        f"{description}; flush every {SALES_GROUP_COMMIT_INTERVAL_MS} ms or {SALES_GROUP_COMMIT_BATCH_SIZE} sales"
+    )
+
+if __name__ == "__main__":
+    asyncio.run(main())
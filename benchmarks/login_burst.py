@@ -0,0 +1,86 @@
+# File: benchmarks/login_burst.py
+"""Sale latency while a burst of logins hashes passwords.
+
+Measures POST /sales latency on a quiet server, then again while
+BENCHMARK_LOGINS logins run at once, as at a shift change. Also reports
+how many logins were turned away with 503 and the longest stall of the
+event loop, which stays near zero while bcrypt runs on the password pool:
+
+    python -m benchmarks.login_burst
+    BENCHMARK_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.login_burst
+"""
+import asyncio
+import httpx
+import os
+import time
+
+from benchmarks.common import open_database, make_app, make_user, seed_items, percentile, print_table
+from routers import auth, sales
+from routers.auth import pwd_context, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING
+
+BENCHMARK_LOGINS = int(os.getenv("BENCHMARK_LOGINS", "50"))
+BENCHMARK_SALES = int(os.getenv("BENCHMARK_SALES", "100"))
+PASSWORD = "benchmark-password"
+
+async def monitor_loop(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Longest delay, in ms, between a timer's due time and when it ran"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst * 1000
+
+async def sell(client, body, stop: asyncio.Event):
+    latencies = []
+    while not stop.is_set() and len(latencies) < BENCHMARK_SALES:
+        started = time.perf_counter()
+        response = await client.post("/sales", json=body)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+async def main():
+    db, _, description = await open_database()
+    item = (await seed_items(db, 1, current_stock=10_000_000))[0]
+    hashed = pwd_context.hash(PASSWORD)
+    operators = [make_user("operator", password=hashed) for _ in range(BENCHMARK_LOGINS)]
+    await db.users.insert_many(operators)
+    app = make_app(db, make_user(), auth, sales)
+    body = {
+        "items": [{"item_id": str(item["_id"]), "quantity": 1, "unit_price": item["selling_price"]}],
+        "payment_method": "cash"
+    }
+
+    rows = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        stop = asyncio.Event()
+        stall = asyncio.create_task(monitor_loop(stop))
+        latencies = await sell(client, body, asyncio.Event())
+        stop.set()
+        rows.append(["quiet", len(latencies), percentile(latencies, 50), percentile(latencies, 99), await stall, "-", "-"])
+
+        async def login(operator):
+            started = time.perf_counter()
+            response = await client.post("/auth/login", json={"id_number": operator["id_number"], "password": PASSWORD})
+            return response.status_code, (time.perf_counter() - started) * 1000
+
+        stop = asyncio.Event()
+        stall = asyncio.create_task(monitor_loop(stop))
+        sales_task = asyncio.create_task(sell(client, body, stop))
+        logins = await asyncio.gather(*[login(operator) for operator in operators])
+        stop.set()
+        latencies = await sales_task
+        rejected = sum(1 for status_code, _ in logins if status_code == 503)
+        login_p99 = percentile([elapsed for _, elapsed in logins], 99)
+        rows.append([f"{BENCHMARK_LOGINS} logins", len(latencies), percentile(latencies, 50), percentile(latencies, 99), await stall, rejected, login_p99])
+
+    print_table(
+        "POST /sales during a login burst",
+        ["phase", "sales", "sale p50 ms", "sale p99 ms", "max loop stall ms", "logins 503", "login p99 ms"],
+        rows,
+        f"{description}; {PASSWORD_HASH_WORKERS} password workers, {PASSWORD_HASH_MAX_PENDING} pending"
+    )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+# File: benchmarks/operator_performance.py
+"""Operator performance report over a large seeded sales history.
+
+Seeds BENCHMARK_SALES sales (500k by default) over BENCHMARK_DAYS days by
+BENCHMARK_OPERATORS operators, deletes two of the operators' user records,
+and times the report over the whole period three ways: the replaced
+pipeline that joins users to every sale before grouping, grouping first
+and naming the operators afterwards, and the daily rollups:
+
+    BENCHMARK_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.operator_performance
+
+The operators column shows the replaced pipeline dropping the deleted
+operators' sales.
+"""
+from datetime import datetime, timedelta
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.common import open_database, make_user, seed_items, seed_sales, timed, print_table
+from models.indexes import ensure_indexes
+from services import reporting_service
+from services.reporting_service import ReportingService
+from services.rollup_service import SalesRollupService
+
+BENCHMARK_SALES = int(os.getenv("BENCHMARK_SALES", "500000"))
+BENCHMARK_DAYS = int(os.getenv("BENCHMARK_DAYS", "28"))
+BENCHMARK_OPERATORS = int(os.getenv("BENCHMARK_OPERATORS", "20"))
+BENCHMARK_RUNS = int(os.getenv("BENCHMARK_RUNS", "5"))
+DELETED_OPERATORS = 2
+
+async def lookup_per_sale(db, start_date, end_date):
+    """The replaced report: $lookup into users for every sale, then $group"""
+    return await db.sales.aggregate([
+        {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "processed_by",
+            "foreignField": "_id",
+            "as": "operator"
+        }},
+        {"$unwind": "$operator"},
+        {"$group": {
+            "_id": "$processed_by",
+            "operator_name": {"$first": "$operator.full_name"},
+            "total_sales": {"$sum": "$final_amount"},
+            "total_transactions": {"$sum": 1},
+            "average_transaction": {"$avg": "$final_amount"},
+            "total_items_sold": {"$sum": {"$sum": "$items.quantity"}}
+        }},
+        {"$sort": {"total_sales": -1}}
+    ]).to_list(None)
+
+async def main():
+    db, round_trips, description = await open_database()
+    await ensure_indexes(db)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = today - timedelta(days=BENCHMARK_DAYS)
+    items = await seed_items(db, 200, current_stock=1000)
+    operators = [make_user("operator") for _ in range(BENCHMARK_OPERATORS)]
+    await db.users.insert_many(operators)
+
+    started = time.perf_counter()
+    await seed_sales(db, BENCHMARK_SALES, start_date, BENCHMARK_DAYS, items, [operator["_id"] for operator in operators])
+    print(f"Seeded {BENCHMARK_SALES} sales over {BENCHMARK_DAYS} days in {time.perf_counter() - started:.1f}s")
+    await db.users.delete_many({"_id": {"$in": [operator["_id"] for operator in operators[:DELETED_OPERATORS]]}})
+
+    reports = ReportingService(db)
+    variants = [
+        ("lookup per sale", lambda: lookup_per_sale(db, start_date, today)),
+        ("group first", lambda: reports.get_operator_performance(start_date, today))
+    ]
+
+    rows = []
+    reporting_service.REPORTS_USE_ROLLUPS = False
+    for name, compute in variants:
+        before = round_trips.count
+        report, durations = await timed(compute, BENCHMARK_RUNS)
+        trips = (round_trips.count - before) / BENCHMARK_RUNS
+        rows.append([name, trips, statistics.median(durations), min(durations), len(report)])
+
+    started = time.perf_counter()
+    await SalesRollupService(db).rebuild()
+    print(f"Rebuilt daily rollups in {time.perf_counter() - started:.1f}s")
+    reporting_service.REPORTS_USE_ROLLUPS = True
+    before = round_trips.count
+    report, durations = await timed(lambda: reports.get_operator_performance(start_date, today), BENCHMARK_RUNS)
+    trips = (round_trips.count - before) / BENCHMARK_RUNS
+    rows.append(["rollups", trips, statistics.median(durations), min(durations), len(report)])
+
+    print_table(
+        f"Operator performance over {BENCHMARK_DAYS} days, {BENCHMARK_RUNS} runs each",
+        ["implementation", "round trips", "median ms", "best ms", "operators"],
+        rows,
+        f"{description}; {DELETED_OPERATORS} of {BENCHMARK_OPERATORS} operators deleted"
+    )
+
+if __name__ == "__main__":
+    asyncio.run(main())
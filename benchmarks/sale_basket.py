@@ -0,0 +1,113 @@
+# File: benchmarks/sale_basket.py
+"""Round trips and latency of POST /sales as the basket grows.
+
+Compares the per-line find_one/update_one path that was replaced with the
+current one: a single $in lookup, one conditional find_one_and_update per
+line, sent concurrently (or in turn inside a transaction on replica sets,
+SALES_USE_TRANSACTIONS), the insert and one rollup bulk_write. The
+decrements return the new stock levels, so low stock crossings need no
+read after the commit, and sales recorded today touch no report snapshots.
+
+Run with:
+
+    python -m benchmarks.sale_basket
+    BENCHMARK_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.sale_basket
+
+Measured on mongomock at 0.5 ms per round trip, 200 sales per row:
+
+    lines  path         round trips/sale  p50 ms  p99 ms
+    1      per line      3                  3.89   17.04
+    1      conditional   4                  7.63   11.31
+    10     per line     21                 28.83   32.21
+    10     conditional  13                 11.70   18.02
+    50     per line    101                138.66  156.65
+    50     conditional  53                 31.40   58.46
+
+The decrements overlap, so latency grows with the basket far slower than
+the round trip count; what growth remains on mongomock is its per-call
+collection scan, which an indexed _id lookup on a server does not pay.
+"""
+from datetime import datetime
+import asyncio
+import httpx
+import os
+import time
+
+from benchmarks.common import open_database, make_app, make_user, seed_items, percentile, print_table
+from routers import sales
+from services import sales_service
+
+BASKET_SIZES = [1, 10, 50]
+BENCHMARK_SALES = int(os.getenv("BENCHMARK_SALES", "200"))
+
+async def per_line_sale(db, lines, user):
+    """The replaced path: a lookup and a stock update per line, then the insert"""
+    sale_items = []
+    for line in lines:
+        item = await db.items.find_one({"_id": line["item_id"]})
+        if item["current_stock"] < line["quantity"]:
+            raise ValueError(f"Insufficient stock for {item['name']}")
+        sale_items.append({**line, "item_name": item["name"], "total_price": line["quantity"] * line["unit_price"]})
+    for line in lines:
+        await db.items.update_one({"_id": line["item_id"]}, {"$inc": {"current_stock": -line["quantity"]}})
+    total = sum(line["total_price"] for line in sale_items)
+    await db.sales.insert_one({
+        "items": sale_items,
+        "total_amount": total,
+        "final_amount": total,
+        "payment_method": "cash",
+        "processed_by": user["_id"],
+        "created_at": datetime.utcnow()
+    })
+
+async def measure(round_trips, sell):
+    latencies = []
+    before = round_trips.count
+    for _ in range(BENCHMARK_SALES):
+        started = time.perf_counter()
+        await sell()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return (round_trips.count - before) / BENCHMARK_SALES, latencies
+
+async def supports_transactions(db) -> bool:
+    try:
+        return "setName" in await db.command("hello")
+    except Exception:
+        return False
+
+async def main():
+    db, round_trips, description = await open_database()
+    paths = ["conditional"] + (["transaction"] if await supports_transactions(db) else [])
+    user = make_user()
+    items = await seed_items(db, max(BASKET_SIZES), current_stock=10_000_000)
+    app = make_app(db, user, sales)
+
+    rows = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        for size in BASKET_SIZES:
+            basket = [{"item_id": item["_id"], "quantity": 1, "unit_price": item["selling_price"]} for item in items[:size]]
+            body = {
+                "items": [{**line, "item_id": str(line["item_id"])} for line in basket],
+                "payment_method": "cash"
+            }
+
+            async def post_sale():
+                response = await client.post("/sales", json=body)
+                response.raise_for_status()
+
+            trips, latencies = await measure(round_trips, lambda: per_line_sale(db, basket, user))
+            rows.append([size, "per line", trips, percentile(latencies, 50), percentile(latencies, 99)])
+            for path in paths:
+                sales_service.SALES_USE_TRANSACTIONS = path == "transaction"
+                trips, latencies = await measure(round_trips, post_sale)
+                rows.append([size, path, trips, percentile(latencies, 50), percentile(latencies, 99)])
+
+    print_table(
+        f"POST /sales, {BENCHMARK_SALES} sales per row",
+        ["lines", "path", "round trips/sale", "p50 ms", "p99 ms"],
+        rows,
+        description
+    )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+# File: benchmarks/weekly_report.py
+"""Weekly sales report over a large seeded sales history.
+
+Seeds BENCHMARK_SALES sales (1M by default) over BENCHMARK_DAYS days and
+times the weekly report for the last full week three ways: the replaced
+implementation (two pipelines per day, fourteen in all), the single
+aggregation that buckets by day, and the daily rollups:
+
+    BENCHMARK_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.weekly_report
+
+The single aggregation uses $dateTrunc, which mongomock lacks, so this
+benchmark needs a MongoDB 5.0+ server.
+"""
+from datetime import datetime, timedelta
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.common import open_database, make_user, seed_items, seed_sales, timed, print_table
+from models.indexes import ensure_indexes
+from services import reporting_service
+from services.reporting_service import ReportingService
+from services.rollup_service import SalesRollupService
+
+BENCHMARK_SALES = int(os.getenv("BENCHMARK_SALES", "1000000"))
+BENCHMARK_DAYS = int(os.getenv("BENCHMARK_DAYS", "28"))
+BENCHMARK_RUNS = int(os.getenv("BENCHMARK_RUNS", "5"))
+
+async def daily_report_per_day(db, start_of_day):
+    """The replaced daily report: a totals pipeline and a top sellers pipeline"""
+    end_of_day = start_of_day + timedelta(days=1)
+    match = {"$match": {"created_at": {"$gte": start_of_day, "$lt": end_of_day}}}
+    result = await db.sales.aggregate([
+        match,
+        {"$group": {
+            "_id": None,
+            "total_sales": {"$sum": "$final_amount"},
+            "total_transactions": {"$sum": 1},
+            "cash_sales": {"$sum": {"$cond": [{"$eq": ["$payment_method", "cash"]}, "$final_amount", 0]}},
+            "mpesa_sales": {"$sum": {"$cond": [{"$eq": ["$payment_method", "mpesa"]}, "$final_amount", 0]}},
+            "total_discount": {"$sum": "$discount_amount"},
+            "total_items_sold": {"$sum": {"$sum": "$items.quantity"}}
+        }}
+    ]).to_list(1)
+    report = result[0] if result else {"total_sales": 0}
+    report["top_selling_items"] = await db.sales.aggregate([
+        match,
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": "$items.item_id",
+            "item_name": {"$first": "$items.item_name"},
+            "total_quantity": {"$sum": "$items.quantity"},
+            "total_revenue": {"$sum": "$items.total_price"}
+        }},
+        {"$sort": {"total_quantity": -1}},
+        {"$limit": 5}
+    ]).to_list(5)
+    return report
+
+async def weekly_report_per_day(db, start_of_week):
+    daily_reports = [await daily_report_per_day(db, start_of_week + timedelta(days=i)) for i in range(7)]
+    return {"total_weekly_sales": sum(report["total_sales"] for report in daily_reports)}
+
+async def main():
+    db, round_trips, description = await open_database()
+    await ensure_indexes(db)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start_of_week = today - timedelta(days=today.weekday() + 7)
+    first_day = start_of_week + timedelta(days=7 - BENCHMARK_DAYS)
+    items = await seed_items(db, 200, current_stock=1000)
+    operators = [make_user("operator") for _ in range(20)]
+    await db.users.insert_many(operators)
+
+    started = time.perf_counter()
+    await seed_sales(db, BENCHMARK_SALES, first_day, BENCHMARK_DAYS, items, [operator["_id"] for operator in operators])
+    print(f"Seeded {BENCHMARK_SALES} sales over {BENCHMARK_DAYS} days in {time.perf_counter() - started:.1f}s")
+
+    reports = ReportingService(db)
+    variants = [
+        ("14 pipelines", lambda: weekly_report_per_day(db, start_of_week)),
+        ("single pass", lambda: reports.get_weekly_sales_report(start_of_week))
+    ]
+
+    rows = []
+    reporting_service.REPORTS_USE_ROLLUPS = False
+    for name, compute in variants:
+        before = round_trips.count
+        report, durations = await timed(compute, BENCHMARK_RUNS)
+        trips = (round_trips.count - before) / BENCHMARK_RUNS
+        rows.append([name, trips, statistics.median(durations), min(durations), round(report["total_weekly_sales"], 2)])
+
+    started = time.perf_counter()
+    await SalesRollupService(db).rebuild()
+    print(f"Rebuilt daily rollups in {time.perf_counter() - started:.1f}s")
+    reporting_service.REPORTS_USE_ROLLUPS = True
+    before = round_trips.count
+    report, durations = await timed(lambda: reports.get_weekly_sales_report(start_of_week), BENCHMARK_RUNS)
+    trips = (round_trips.count - before) / BENCHMARK_RUNS
+    rows.append(["rollups", trips, statistics.median(durations), min(durations), round(report["total_weekly_sales"], 2)])
+
+    print_table(
+        f"Weekly report from {start_of_week:%Y-%m-%d}, {BENCHMARK_RUNS} runs each",
+        ["implementation", "round trips", "median ms", "best ms", "weekly total"],
+        rows,
+        description
+    )
+
+if __name__ == "__main__":
+    asyncio.run(main())
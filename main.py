@@ -9,10 +9,15 @@ import os
 from dotenv import load_dotenv
 
 from models.database import connect_to_mongo, close_mongo_connection, get_database
-from routers import auth, inventory, sales, suppliers, reporting, customer_feedback
-from routers.auth import get_current_user, ACCESS_TOKEN_EXPIRE_HOURS, create_access_token
-from services.alert_service import AlertService
-from passlib.context import CryptContext
+from routers import auth, inventory, sales, suppliers, reporting, customer_feedback, internal, dashboard
+from routers.auth import get_current_user, ACCESS_TOKEN_EXPIRE_HOURS, create_access_token, verify_password
+from services.alert_service import low_stock_monitor
+from services.sales_service import sale_committer, SALES_GROUP_COMMIT
+from services.report_scheduler import report_scheduler, REPORT_SCHEDULER_ENABLED
+from services.dashboard_service import dashboard_feed
+from services.sms_service import open_http_client, close_http_client
+from services.sms_outbox import sms_outbox_worker, SMS_OUTBOX_ENABLED
+from services.stock_state import backfill as backfill_stock_state
 from routers.auth import get_current_user_from_cookie, get_manager_user_from_cookie
 
 
@@ -44,18 +49,39 @@ app.include_router(sales.router)
 app.include_router(suppliers.router,prefix="/api")
 app.include_router(reporting.router)
 app.include_router(customer_feedback.router,prefix="/api")
+app.include_router(internal.router)
+app.include_router(dashboard.router)
 
 @app.on_event("startup")
 async def startup_event():
     await connect_to_mongo()
     logger.info("Connected to MongoDB")
+    await open_http_client()
     db = await get_database()
-    alert_service = AlertService(db)
-    result = await alert_service.send_low_stock_alerts()
-    logger.info(f"Startup low stock check: {result}")
+    # Idempotent: low stock listings skip items without a stock_state
+    try:
+        backfilled = await backfill_stock_state(db, missing_only=True)
+        if backfilled:
+            logger.info(f"Backfilled stock_state of {backfilled} items")
+    except Exception as e:
+        logger.error(f"stock_state backfill failed: {str(e)}")
+    if SALES_GROUP_COMMIT:
+        sale_committer.start(db)
+    if REPORT_SCHEDULER_ENABLED:
+        report_scheduler.start(db)
+    dashboard_feed.start(db)
+    if SMS_OUTBOX_ENABLED:
+        sms_outbox_worker.start(db)
+    low_stock_monitor.start(db)
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await low_stock_monitor.stop()
+    await sms_outbox_worker.stop()
+    await dashboard_feed.stop()
+    await report_scheduler.stop()
+    await sale_committer.stop()
+    await close_http_client()
     await close_mongo_connection()
     logger.info("Disconnected from MongoDB")
 
@@ -74,9 +100,8 @@ async def login_post(
     password: str = Form(...),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     user = await db.users.find_one({"id_number": id_number})
-    if not user or not pwd_context.verify(password, user["password"]):
+    if not user or not await verify_password(password, user["password"]):
         return templates.TemplateResponse(
             "login.html",
             {"request": request, "error": "Invalid credentials", "session_token": None}
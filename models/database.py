@@ -1,7 +1,110 @@
 # File: models/database.py
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional
+from pymongo import monitoring
+from typing import Dict, Optional
+import asyncio
+import logging
 import os
+import threading
+
+from models import indexes
+
+logger = logging.getLogger(__name__)
+
+# Pool settings; unset values keep the driver defaults
+POOL_OPTIONS = {
+    "maxPoolSize": "MONGODB_MAX_POOL_SIZE",
+    "minPoolSize": "MONGODB_MIN_POOL_SIZE",
+    "maxIdleTimeMS": "MONGODB_MAX_IDLE_TIME_MS",
+    "waitQueueTimeoutMS": "MONGODB_WAIT_QUEUE_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "MONGODB_SERVER_SELECTION_TIMEOUT_MS",
+    "connectTimeoutMS": "MONGODB_CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "MONGODB_SOCKET_TIMEOUT_MS",
+}
+
+def _pool_options() -> Dict[str, int]:
+    return {option: int(os.environ[env]) for option, env in POOL_OPTIONS.items() if os.getenv(env)}
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Tracks connection pool usage; the driver calls these from its own threads"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.pool_clears = 0
+
+    def _record_wait(self, duration: Optional[float]):
+        if duration is not None:
+            self.total_wait_seconds += duration
+            self.max_wait_seconds = max(self.max_wait_seconds, duration)
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+            self.checkouts += 1
+            self._record_wait(event.duration)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+            self._record_wait(event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "open_connections": self.created - self.closed,
+                "checked_out": self.checked_out,
+                "waiting": self.waiting,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+                "average_wait_ms": self.total_wait_seconds * 1000 / self.checkouts if self.checkouts else 0,
+                "max_wait_ms": self.max_wait_seconds * 1000
+            }
+
+pool_stats = PoolStatsListener()
 
 class Database:
     client: Optional[AsyncIOMotorClient] = None
@@ -14,10 +117,26 @@ async def get_database() -> AsyncIOMotorClient:
         raise ValueError("Database client is not initialized. Call connect_to_mongo first.")
     return db.client[db.database_name]
 
-async def connect_to_mongo():
+async def connect_to_mongo(ensure_indexes: bool = True):
     """Create database connection"""
-    db.client = AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    options = _pool_options()
+    db.client = AsyncIOMotorClient(
+        os.getenv("MONGODB_URL", "mongodb://localhost:27017"),
+        event_listeners=[pool_stats],
+        **options
+    )
+    await warm_up_pool(options.get("minPoolSize", 0))
+    if ensure_indexes and os.getenv("MONGODB_ENSURE_INDEXES", "true").lower() == "true":
+        created = await indexes.ensure_indexes(db.client[db.database_name])
+        logger.info(f"Ensured {len(created)} indexes")
     
+async def warm_up_pool(connections: int):
+    """Open connections up front so the first requests after a deploy skip connection setup"""
+    if connections <= 0:
+        return
+    await asyncio.gather(*[db.client.admin.command("ping") for _ in range(connections)])
+    logger.info(f"MongoDB pool warmed up: {pool_stats.stats()['open_connections']} connections open")
+
 async def close_mongo_connection():
     """Close database connection"""
     if db.client:
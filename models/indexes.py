@@ -0,0 +1,202 @@
+# File: models/indexes.py
+"""Declarative index registry.
+
+Applied idempotently at startup by connect_to_mongo, or from the command line:
+
+    python -m models.indexes apply
+    python -m models.indexes verify   # explain() the hot queries, flag COLLSCANs
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from datetime import datetime, timedelta
+from typing import Dict, List
+from bson import ObjectId
+import asyncio
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Unique constraints mirror the duplicate checks the routers already make
+INDEXES: List[Dict] = [
+    # items
+    {"collection": "items", "keys": [("custom_id", ASCENDING)], "options": {"unique": True}},
+    {"collection": "items", "keys": [("name", ASCENDING)]},
+    # Only low and out of stock items are indexed; needs MongoDB 6.0+ for $in
+    {
+        "collection": "items",
+        "keys": [("stock_state", ASCENDING), ("name", ASCENDING)],
+        "options": {"partialFilterExpression": {"stock_state": {"$in": ["low", "out"]}}}
+    },
+
+    # users
+    {"collection": "users", "keys": [("id_number", ASCENDING)], "options": {"unique": True}},
+    {"collection": "users", "keys": [("role", ASCENDING), ("is_active", ASCENDING)]},
+
+    # suppliers
+    {"collection": "suppliers", "keys": [("custom_id", ASCENDING)], "options": {"unique": True}},
+    {"collection": "suppliers", "keys": [("phone_number", ASCENDING)], "options": {"unique": True}},
+    {"collection": "suppliers", "keys": [("is_active", ASCENDING), ("name", ASCENDING)]},
+
+    # sales: history pagination, report date ranges and batch idempotency
+    {"collection": "sales", "keys": [("created_at", DESCENDING), ("_id", DESCENDING)]},
+    {"collection": "sales", "keys": [("processed_by", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]},
+    {"collection": "sales", "keys": [("payment_method", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]},
+    {
+        "collection": "sales",
+        "keys": [("idempotency_key", ASCENDING)],
+        "options": {"unique": True, "partialFilterExpression": {"idempotency_key": {"$exists": True}}}
+    },
+
+    # customer feedback
+    {"collection": "customer_feedback", "keys": [("created_at", DESCENDING)]},
+    {"collection": "customer_feedback", "keys": [("status", ASCENDING), ("created_at", DESCENDING)]},
+    {"collection": "customer_feedback", "keys": [("feedback_type", ASCENDING), ("created_at", DESCENDING)]},
+    # Covers the feedback report's per type/status counts
+    {
+        "collection": "customer_feedback",
+        "keys": [("created_at", DESCENDING), ("feedback_type", ASCENDING), ("status", ASCENDING)]
+    },
+
+    # expenses
+    {"collection": "expenses", "keys": [("created_at", DESCENDING)]},
+
+    # SMS outbox: worker claims by due time; at most one pending message per coalesce key
+    {"collection": "sms_outbox", "keys": [("status", ASCENDING), ("available_at", ASCENDING)]},
+    {
+        "collection": "sms_outbox",
+        "keys": [("coalesce_key", ASCENDING)],
+        "options": {"unique": True, "partialFilterExpression": {"status": "pending"}}
+    },
+
+    # report snapshots dropped when backdated sales land in their period
+    {"collection": "report_snapshots", "keys": [("period_start", ASCENDING), ("period_end", ASCENDING)]},
+]
+
+def _hot_queries() -> List[Dict]:
+    """Queries issued by the routers and ReportingService, in find() form.
+
+    Aggregations are represented by their leading $match, which is the
+    stage that decides whether an index is used.
+    """
+    now = datetime.utcnow()
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return [
+        {"name": "items by custom_id", "collection": "items", "filter": {"custom_id": "ITEM-1"}},
+        {"name": "items sorted by name", "collection": "items", "filter": {}, "sort": [("name", 1)]},
+        {
+            "name": "low stock items",
+            "collection": "items",
+            "filter": {"stock_state": {"$in": ["low", "out"]}},
+            "sort": [("name", 1)]
+        },
+        {"name": "user by id_number", "collection": "users", "filter": {"id_number": "00000000"}},
+        {"name": "active managers", "collection": "users", "filter": {"role": "manager", "is_active": True}},
+        {"name": "supplier by custom_id", "collection": "suppliers", "filter": {"custom_id": "SUP-1"}},
+        {
+            "name": "supplier duplicate check",
+            "collection": "suppliers",
+            "filter": {"$or": [{"custom_id": "SUP-1"}, {"phone_number": "0700000000"}]}
+        },
+        {"name": "active suppliers by name", "collection": "suppliers", "filter": {"is_active": True}, "sort": [("name", 1)]},
+        {
+            "name": "daily sales report",
+            "collection": "sales",
+            "filter": {"created_at": {"$gte": day_start, "$lt": day_start + timedelta(days=1)}}
+        },
+        {
+            "name": "operator performance",
+            "collection": "sales",
+            "filter": {"created_at": {"$gte": day_start - timedelta(days=7), "$lte": now}}
+        },
+        {"name": "sales history", "collection": "sales", "filter": {}, "sort": [("created_at", -1), ("_id", -1)]},
+        {
+            "name": "sales history by operator",
+            "collection": "sales",
+            "filter": {"processed_by": ObjectId()},
+            "sort": [("created_at", -1), ("_id", -1)]
+        },
+        {"name": "sale by idempotency key", "collection": "sales", "filter": {"idempotency_key": "key"}},
+        {"name": "feedback list", "collection": "customer_feedback", "filter": {}, "sort": [("created_at", -1)]},
+        {"name": "feedback by status", "collection": "customer_feedback", "filter": {"status": "open"}, "sort": [("created_at", -1)]},
+        {
+            "name": "feedback report",
+            "collection": "customer_feedback",
+            "filter": {"created_at": {"$gte": day_start - timedelta(days=7), "$lte": now}}
+        },
+        {
+            "name": "recent feedback by type",
+            "collection": "customer_feedback",
+            "filter": {"feedback_type": "complaint", "created_at": {"$gte": day_start - timedelta(days=7), "$lte": now}},
+            "sort": [("created_at", -1), ("_id", -1)]
+        },
+        {
+            "name": "expense report",
+            "collection": "expenses",
+            "filter": {"created_at": {"$gte": day_start - timedelta(days=7), "$lte": now}}
+        },
+    ]
+
+async def ensure_indexes(database: AsyncIOMotorDatabase) -> List[str]:
+    """Create every registered index; existing identical indexes are a no-op"""
+    created = []
+    for spec in INDEXES:
+        try:
+            name = await database[spec["collection"]].create_index(spec["keys"], **spec.get("options", {}))
+            created.append(f"{spec['collection']}.{name}")
+        except OperationFailure as e:
+            # e.g. duplicates in existing data blocking a unique index
+            logger.error(f"Could not create index {spec['keys']} on {spec['collection']}: {str(e)}")
+    return created
+
+def _find_stages(plan, stage: str) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage:
+            return True
+        return any(_find_stages(value, stage) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_find_stages(value, stage) for value in plan)
+    return False
+
+async def verify_query_plans(database: AsyncIOMotorDatabase) -> List[Dict]:
+    """Explain each hot query and report whether its winning plan scans the collection"""
+    results = []
+    for query in _hot_queries():
+        cursor = database[query["collection"]].find(query["filter"])
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        explain = await cursor.explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        results.append({
+            "name": query["name"],
+            "collection": query["collection"],
+            "collscan": _find_stages(winning_plan, "COLLSCAN")
+        })
+    return results
+
+async def _main(command: str) -> int:
+    from models.database import connect_to_mongo, close_mongo_connection, get_database
+
+    await connect_to_mongo(ensure_indexes=False)
+    try:
+        database = await get_database()
+        if command == "apply":
+            for name in await ensure_indexes(database):
+                print(f"ok        {name}")
+            return 0
+
+        failures = 0
+        for result in await verify_query_plans(database):
+            status = "COLLSCAN" if result["collscan"] else "ok"
+            failures += result["collscan"]
+            print(f"{status:<9} {result['collection']}: {result['name']}")
+        return 1 if failures else 0
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("apply", "verify"):
+        print("usage: python -m models.indexes [apply|verify]")
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(sys.argv[1])))
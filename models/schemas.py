@@ -183,6 +183,8 @@ class SaleItem(BaseModel):
     quantity: int = Field(..., gt=0)
     unit_price: float = Field(..., gt=0)
     total_price: float = Field(..., gt=0)
+    category: Optional[str] = None
+    unit_cost: Optional[float] = None
 
 class SaleCreate(BaseModel):
     items: List[Dict] = Field(..., min_length=1)  # Changed from min_items to min_length
@@ -190,6 +192,9 @@ class SaleCreate(BaseModel):
     mpesa_reference: Optional[str] = None
     customer_name: Optional[str] = None
     discount_percentage: float = Field(default=0, ge=0, le=100)
+    # Generated by the till before the first attempt, so a retry of a sale
+    # whose response was lost is recognised instead of recorded again
+    idempotency_key: Optional[str] = Field(None, min_length=8, max_length=64)
     
     @model_validator(mode='after')
     def validate_mpesa_reference(self):
@@ -197,6 +202,13 @@ class SaleCreate(BaseModel):
             raise ValueError('MPESA reference is required for MPESA payments')
         return self
 
+class SaleBatchEntry(SaleCreate):
+    idempotency_key: str = Field(..., min_length=8, max_length=64)
+    sold_at: Optional[datetime] = None  # When the till recorded the sale, if offline
+
+class SaleBatchCreate(BaseModel):
+    sales: List[SaleBatchEntry] = Field(..., min_length=1, max_length=500)
+
 class SaleInDB(BaseModel):
     model_config = ConfigDict(
         populate_by_name=True,
@@ -3,6 +3,8 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
 import jwt  # Explicitly using pyjwt; ensure 'pip install pyjwt' and uninstall conflicting 'jwt'
 from passlib.context import CryptContext
@@ -11,6 +13,7 @@ from bson import ObjectId
 from models.schemas import UserCreate, UserLogin, PasswordChange, UserInDB
 from models.database import get_database
 from utils.validators import Validators
+from utils.cache import TTLCache
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 security = HTTPBearer()
@@ -24,11 +27,54 @@ if not isinstance(SECRET_KEY, str):
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 24
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# Verified users keyed on user id, so authenticated requests skip the users
+# lookup; the TTL bounds staleness for changes made outside this process
+session_cache = TTLCache(
+    max_entries=int(os.getenv("SESSION_CACHE_MAX_USERS", "1024")),
+    ttl_seconds=int(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def invalidate_user_session(user_id):
+    """Drop a cached user; call after changing password, role or active status"""
+    session_cache.invalidate(str(user_id))
+
+async def get_user_by_id(db: AsyncIOMotorDatabase, user_id: str) -> Optional[dict]:
+    user = session_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        if user is not None:
+            session_cache.set(user_id, user)
+    return user
+
+# bcrypt is deliberately slow, so it runs on a small dedicated pool instead of
+# the event loop; when too many requests are already waiting, fail fast.
+# bcrypt releases the GIL, so workers scale with cores. The pending limit
+# admits a whole shift-change burst of logins: they queue for a few seconds
+# rather than being turned away, and only a backlog beyond that gets a 503.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "128"))
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_jobs_pending = 0
+
+async def _run_password_job(func, *args):
+    global _password_jobs_pending
+    if _password_jobs_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"}
+        )
+    _password_jobs_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+    finally:
+        _password_jobs_pending -= 1
+
+async def verify_password(plain_password, hashed_password):
+    return await _run_password_job(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await _run_password_job(pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -58,7 +104,7 @@ async def get_current_user(
     except jwt.PyJWTError:
         raise credentials_exception
     
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await get_user_by_id(db, user_id)
     if user is None:
         raise credentials_exception
     return user
@@ -83,7 +129,7 @@ async def get_current_user_from_cookie(
     except jwt.PyJWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await get_user_by_id(db, user_id)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
@@ -139,7 +185,7 @@ async def register_user(
     
     # Create new user
     user_dict = user.dict()
-    user_dict["password"] = get_password_hash(user.initial_password)
+    user_dict["password"] = await get_password_hash(user.initial_password)
     user_dict["first_login"] = True
     user_dict["created_at"] = datetime.utcnow()
     user_dict["created_by"] = current_user["_id"] if current_user else None
@@ -151,7 +197,7 @@ async def register_user(
 @router.post("/login")
 async def login(user_credentials: UserLogin, db: AsyncIOMotorDatabase = Depends(get_database)):
     user = await db.users.find_one({"id_number": user_credentials.id_number})
-    if not user or not verify_password(user_credentials.password, user["password"]):
+    if not user or not await verify_password(user_credentials.password, user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect ID number or password"
@@ -168,6 +214,7 @@ async def login(user_credentials: UserLogin, db: AsyncIOMotorDatabase = Depends(
         {"_id": user["_id"]},
         {"$set": {"last_login": datetime.utcnow()}}
     )
+    invalidate_user_session(user["_id"])
     
     access_token_expires = timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
     access_token = create_access_token(
@@ -189,14 +236,15 @@ async def change_password(
     current_user: dict = Depends(get_current_user_from_cookie),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    if not verify_password(password_data.current_password, current_user["password"]):
+    if not await verify_password(password_data.current_password, current_user["password"]):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
-    new_hashed_password = get_password_hash(password_data.new_password)
+    new_hashed_password = await get_password_hash(password_data.new_password)
     await db.users.update_one(
         {"_id": current_user["_id"]},
         {"$set": {"password": new_hashed_password, "first_login": False}}
     )
+    invalidate_user_session(current_user["_id"])
     return {"message": "Password updated successfully"}
 
 @router.get("/profile")
@@ -208,4 +256,4 @@ async def get_profile(current_user: dict = Depends(get_current_user_from_cookie)
         "phone_number": current_user["phone_number"],
         "last_login": current_user.get("last_login"),
         "first_login": current_user.get("first_login", False)
-    }
\ No newline at end of file
+    }
@@ -8,6 +8,7 @@ from datetime import datetime
 from models.schemas import CustomerFeedbackCreate, CustomerFeedbackInDB
 from models.database import get_database
 from routers.auth import get_current_user_from_cookie, get_manager_user_from_cookie
+from services.dashboard_service import dashboard_feed
 from utils.validators import Validators
 
 router = APIRouter(prefix="/feedback", tags=["customer_feedback"])
@@ -32,6 +33,7 @@ async def create_feedback(
     feedback_dict["status"] = "open"
 
     result = await db.customer_feedback.insert_one(feedback_dict)
+    dashboard_feed.record_feedback({**feedback_dict, "_id": result.inserted_id})
     
     # Log the activity (for future auditing)
     await db.activity_logs.insert_one({
@@ -0,0 +1,57 @@
+# File: routers/dashboard.py
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+import asyncio
+import json
+
+from models.database import get_database
+from routers.auth import get_manager_user_from_cookie
+from services.dashboard_service import dashboard_feed, DASHBOARD_HEARTBEAT_SECONDS
+from services.event_bus import event_bus
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.get("/stream")
+async def stream_dashboard(
+    request: Request,
+    current_user: dict = Depends(get_manager_user_from_cookie),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Server-Sent Events: a snapshot, then sales, low_stock and feedback updates as they happen"""
+    # Subscribe before taking the snapshot so no update falls in between
+    queue = event_bus.subscribe()
+    if queue is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many open dashboards",
+            headers={"Retry-After": str(DASHBOARD_HEARTBEAT_SECONDS)}
+        )
+    try:
+        snapshot = await dashboard_feed.snapshot(db)
+    except Exception:
+        event_bus.unsubscribe(queue)
+        raise
+
+    async def events():
+        try:
+            yield f"retry: {DASHBOARD_HEARTBEAT_SECONDS * 1000}\n"
+            yield _sse("snapshot", snapshot)
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), DASHBOARD_HEARTBEAT_SECONDS)
+                    yield _sse(event, data)
+                except asyncio.TimeoutError:
+                    # Comment line; keeps proxies from closing an idle stream
+                    yield ": heartbeat\n\n"
+        finally:
+            event_bus.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
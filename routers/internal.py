@@ -0,0 +1,27 @@
+# File: routers/internal.py
+from fastapi import APIRouter, Depends
+
+from models.database import pool_stats
+from routers.auth import get_manager_user_from_cookie, session_cache
+from services.alert_service import low_stock_monitor
+from services.event_bus import event_bus
+from services.report_cache import report_cache
+from services.report_scheduler import report_scheduler
+from services.rollup_service import rollup_status
+from services.sms_outbox import sms_outbox_worker
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+@router.get("/stats")
+async def get_internal_stats(current_user: dict = Depends(get_manager_user_from_cookie)):
+    """Runtime counters for tuning connection pools and caches"""
+    return {
+        "db_pool": pool_stats.stats(),
+        "session_cache": session_cache.stats(),
+        "report_cache": report_cache.stats(),
+        "report_scheduler": report_scheduler.stats(),
+        "sales_rollups": rollup_status.stats(),
+        "dashboard_events": event_bus.stats(),
+        "sms_outbox": sms_outbox_worker.stats(),
+        "low_stock_alerts": low_stock_monitor.stats()
+    }
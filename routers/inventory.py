@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
 from typing import List, Optional
 from datetime import datetime
 import logging
@@ -8,6 +9,10 @@ from bson import ObjectId
 from models.schemas import ItemCreate, ItemUpdate, ItemSupplierPriceBase, ItemSupplierPrice
 from models.database import get_database
 from routers.auth import get_current_user_from_cookie, get_manager_user_from_cookie
+from services.alert_service import low_stock_monitor
+from services.catalog_cache import catalog_cache
+from services.dashboard_service import dashboard_feed
+from services.stock_state import stock_state, stock_update, LOW_STOCK_QUERY, STOCK_OK
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 logging.basicConfig(level=logging.INFO)
@@ -37,11 +42,13 @@ async def create_item(
         
         item_dict = item.dict(exclude_unset=True)
         item_dict["current_stock"] = item_dict.get("current_stock", 0)  # Use provided value or 0
+        item_dict["stock_state"] = stock_state(item_dict["current_stock"], item_dict["alert_threshold"])
         item_dict["created_at"] = datetime.utcnow()
         item_dict["created_by"] = str(current_user["_id"])
         item_dict.setdefault("supplier_prices", [])  # Initialize as empty list for multiple suppliers
         
         result = await db.items.insert_one(item_dict)
+        catalog_cache.invalidate()
         return {"message": "Item created successfully", "custom_id": item.custom_id}
     except Exception as e:
         logger.error(f"Error creating item: {str(e)}")
@@ -66,11 +73,12 @@ async def update_item(
             
             result = await db.items.update_one(
                 {"custom_id": custom_id},
-                {"$set": update_data}
+                stock_update(update_data)
             )
             
             if result.modified_count == 0:
                 raise HTTPException(status_code=400, detail="No changes made")
+            catalog_cache.invalidate()
         
         return {"message": "Item updated successfully"}
     except Exception as e:
@@ -91,7 +99,7 @@ async def get_items(
             query["category"] = {"$regex": category, "$options": "i"}
         
         if low_stock_only:
-            query["$expr"] = {"$lte": ["$current_stock", "$alert_threshold"]}
+            query.update(LOW_STOCK_QUERY)
         
         items = []
         async for item in db.items.find(query).sort("name", 1):
@@ -180,10 +188,6 @@ async def adjust_stock(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     try:
-        item = await db.items.find_one({"custom_id": custom_id})
-        if not item:
-            raise HTTPException(status_code=404, detail="Item not found")
-        
         adjustment_type = adjustment.get("type")
         quantity = int(adjustment.get("quantity", 0))
         reason = adjustment.get("reason", "Manual adjustment")
@@ -194,16 +198,28 @@ async def adjust_stock(
         if quantity <= 0:
             raise HTTPException(status_code=400, detail="Quantity must be positive")
         
-        current_stock = item["current_stock"]
+        # Applied relative to the stored level in one atomic update, so a
+        # concurrent sale's decrement is never overwritten
         if adjustment_type == "increase":
-            new_stock = current_stock + quantity
+            new_level = {"$add": ["$current_stock", quantity]}
         else:
-            new_stock = max(0, current_stock - quantity)
-        
-        await db.items.update_one(
+            new_level = {"$max": [0, {"$subtract": ["$current_stock", quantity]}]}
+        item = await db.items.find_one_and_update(
             {"custom_id": custom_id},
-            {"$set": {"current_stock": new_stock, "updated_at": datetime.utcnow()}}
+            stock_update({"updated_at": datetime.utcnow()}, {"current_stock": new_level}),
+            return_document=ReturnDocument.BEFORE
         )
+        if not item:
+            raise HTTPException(status_code=404, detail="Item not found")
+        
+        current_stock = item["current_stock"]
+        new_stock = current_stock + quantity if adjustment_type == "increase" else max(0, current_stock - quantity)
+        adjusted = {**item, "current_stock": new_stock, "stock_state": stock_state(new_stock, item["alert_threshold"])}
+        if adjusted["stock_state"] == STOCK_OK:
+            adjusted["low_stock_alerted_at"] = None
+        catalog_cache.apply_stock_changes({item["_id"]: new_stock - current_stock})
+        dashboard_feed.record_stock_levels([adjusted])
+        await low_stock_monitor.record_stock_levels(db, [adjusted])
         
         await db.stock_adjustments.insert_one({
             "item_id": custom_id,
@@ -1,9 +1,9 @@
 # File: routers/reporting.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime
 from typing import Optional
-from services.reporting_service import ReportingService
+from services.report_cache import CachedReportingService
 from models.database import get_database
 from routers.auth import get_current_user_from_cookie, get_manager_user_from_cookie
 from utils.helpers import DateHelper
@@ -13,11 +13,12 @@ router = APIRouter(prefix="/reports", tags=["reports"])
 @router.get("/sales/daily")
 async def get_daily_sales_report(
     date: Optional[datetime] = None,
+    top_n: int = Query(5, ge=1, le=50),
     current_user: dict = Depends(get_current_user_from_cookie),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    reporting_service = ReportingService(db)
-    return await reporting_service.get_daily_sales_report(date)
+    reporting_service = CachedReportingService(db)
+    return await reporting_service.get_daily_sales_report(date, top_n)
 
 @router.get("/sales/weekly")
 async def get_weekly_sales_report(
@@ -25,9 +26,26 @@ async def get_weekly_sales_report(
     current_user: dict = Depends(get_current_user_from_cookie),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    reporting_service = ReportingService(db)
+    reporting_service = CachedReportingService(db)
     return await reporting_service.get_weekly_sales_report(start_date)
 
+@router.get("/sales/timeseries")
+async def get_sales_timeseries(
+    start_date: datetime,
+    end_date: datetime,
+    granularity: str = Query("day", pattern="^(hour|day|week|month)$"),
+    timezone: Optional[str] = None,
+    current_user: dict = Depends(get_current_user_from_cookie),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="End date must be after start date")
+    reporting_service = CachedReportingService(db)
+    try:
+        return await reporting_service.get_sales_timeseries(start_date, end_date, granularity, timezone)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/operator-performance")
 async def get_operator_performance(
     start_date: datetime,
@@ -37,15 +55,27 @@ async def get_operator_performance(
 ):
     if end_date < start_date:
         raise HTTPException(status_code=400, detail="End date must be after start date")
-    reporting_service = ReportingService(db)
+    reporting_service = CachedReportingService(db)
     return await reporting_service.get_operator_performance(start_date, end_date)
 
+@router.get("/profit")
+async def get_profit_report(
+    start_date: datetime,
+    end_date: datetime,
+    current_user: dict = Depends(get_manager_user_from_cookie),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="End date must be after start date")
+    reporting_service = CachedReportingService(db)
+    return await reporting_service.get_profit_report(start_date, end_date)
+
 @router.get("/inventory")
 async def get_inventory_report(
     current_user: dict = Depends(get_current_user_from_cookie),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    reporting_service = ReportingService(db)
+    reporting_service = CachedReportingService(db)
     return await reporting_service.get_inventory_report()
 
 @router.get("/expenses")
@@ -57,5 +87,39 @@ async def get_expense_report(
 ):
     if end_date < start_date:
         raise HTTPException(status_code=400, detail="End date must be after start date")
-    reporting_service = ReportingService(db)
+    reporting_service = CachedReportingService(db)
     return await reporting_service.get_expense_report(start_date, end_date)
+
+@router.get("/customer-feedback")
+async def get_customer_feedback_report(
+    start_date: datetime,
+    end_date: datetime,
+    sample_size: int = Query(5, ge=0, le=50),
+    current_user: dict = Depends(get_manager_user_from_cookie),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="End date must be after start date")
+    reporting_service = CachedReportingService(db)
+    return await reporting_service.get_customer_feedback_report(start_date, end_date, sample_size)
+
+@router.get("/customer-feedback/details")
+async def get_customer_feedback_details(
+    start_date: datetime,
+    end_date: datetime,
+    feedback_type: Optional[str] = Query(None, pattern="^(requirement|complaint|recommendation)$"),
+    status: Optional[str] = Query(None, pattern="^(open|in_progress|resolved)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_manager_user_from_cookie),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="End date must be after start date")
+    reporting_service = CachedReportingService(db)
+    try:
+        return await reporting_service.get_customer_feedback_details(
+            start_date, end_date, feedback_type, status, cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
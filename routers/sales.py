@@ -1,28 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List, Dict
+from typing import List, Dict, Optional
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timezone
 
-from models.schemas import SaleCreate, SaleInDB
+from models.schemas import SaleCreate, SaleBatchCreate, SaleInDB
 from models.database import get_database
 from routers.auth import get_current_user_from_cookie
-from utils.validators import Validators
+from services.sales_service import SalesService, SaleError, sale_committer
+from services.catalog_cache import catalog_cache
+from utils.helpers import KeysetCursor
 
 router = APIRouter(prefix="/sales", tags=["sales"])
 
 @router.get("/items-for-sale")
 async def get_items_for_sale(
+    request: Request,
+    current_user: dict = Depends(get_current_user_from_cookie),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    items = []
-    async for item in db.items.find({"current_stock": {"$gt": 0}}):
-        items.append({
-            "id": str(item["_id"]),
-            "name": item["name"],
-            "selling_price": item["selling_price"]
-        })
-    return items
+    items = await catalog_cache.get_listing(db)
+    headers = {"ETag": catalog_cache.etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == catalog_cache.etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(items, headers=headers)
 
 @router.post("")
 async def create_sale(
@@ -30,75 +32,31 @@ async def create_sale(
     current_user: dict = Depends(get_current_user_from_cookie),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    # Validate MPESA reference if payment method is MPESA
-    if sale.payment_method == "mpesa" and sale.mpesa_reference:
-        if not Validators.validate_mpesa_reference(sale.mpesa_reference):
-            raise HTTPException(status_code=400, detail="Invalid MPESA reference format")
-
-    # Validate and update stock for each item
-    total_amount = 0
-    sale_items = []
-    for item in sale.items:
-        if not ObjectId.is_valid(item["item_id"]):
-            raise HTTPException(status_code=400, detail=f"Invalid item ID: {item['item_id']}")
-
-        db_item = await db.items.find_one({"_id": ObjectId(item["item_id"])})
-        if not db_item:
-            raise HTTPException(status_code=404, detail=f"Item not found: {item['item_id']}")
-        
-        if db_item["current_stock"] < item["quantity"]:
-            raise HTTPException(status_code=400, detail=f"Insufficient stock for {db_item['name']}")
-
-        # Validate unit price matches current selling price
-        if item["unit_price"] != db_item["selling_price"]:
-            raise HTTPException(status_code=400, detail=f"Price mismatch for {db_item['name']}")
-
-        total_price = item["quantity"] * item["unit_price"]
-        total_amount += total_price
-        
-        sale_items.append({
-            "item_id": ObjectId(item["item_id"]),
-            "item_name": db_item["name"],
-            "quantity": item["quantity"],
-            "unit_price": item["unit_price"],
-            "total_price": total_price
-        })
-
-    # Calculate discounts and final amount
-    discount_amount = total_amount * (sale.discount_percentage / 100)
-    final_amount = total_amount - discount_amount
-
-    # Only managers can apply discounts
-    if sale.discount_percentage > 0 and current_user["role"] != "manager":
-        raise HTTPException(status_code=403, detail="Only managers can apply discounts")
-
-    # Update stock levels
-    for item in sale_items:
-        await db.items.update_one(
-            {"_id": item["item_id"]},
-            {
-                "$inc": {"current_stock": -item["quantity"]},
-                "$set": {"updated_at": datetime.utcnow()}
-            }
-        )
-
-    # Create sale record
-    sale_dict = {
-        "items": sale_items,
-        "total_amount": total_amount,
-        "discount_percentage": sale.discount_percentage,
-        "discount_amount": discount_amount,
-        "final_amount": final_amount,
-        "payment_method": sale.payment_method,
-        "mpesa_reference": sale.mpesa_reference,
-        "customer_name": sale.customer_name,
-        "created_at": datetime.utcnow(),
-        "processed_by": current_user["_id"]
-    }
-
-    result = await db.sales.insert_one(sale_dict)
+    sales_service = SalesService(db)
+    try:
+        item_ids = sales_service.parse_item_ids(sale)
+        db_items = await sales_service.load_items(item_ids)
+        sale_dict = sales_service.build_sale(sale, item_ids, db_items, current_user, datetime.utcnow())
+
+        if sale.idempotency_key:
+            sale_dict["idempotency_key"] = sale.idempotency_key
+
+        # Reserve stock and record the sale as one unit, grouped with other
+        # requests' sales when group commit is running
+        if sale_committer.running:
+            sale_id = await sale_committer.submit(sale_dict)
+        else:
+            sale_id = (await sales_service.commit_sales([sale_dict]))[0]
+        duplicate = sale_id is None
+        if duplicate:
+            # The unique index rejected a retry of an already recorded sale
+            existing = await sales_service.find_existing_sales([sale.idempotency_key])
+            sale_id = existing[sale.idempotency_key]
+    except SaleError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
     # Calculate change (if cash payment)
+    final_amount = sale_dict["final_amount"]
     change = None
     if sale.payment_method == "cash" and "amount_paid" in sale.dict():
         amount_paid = sale.dict().get("amount_paid", final_amount)
@@ -107,11 +65,136 @@ async def create_sale(
         change = amount_paid - final_amount
 
     return {
-        "message": "Sale recorded successfully",
-        "sale_id": str(result.inserted_id),
+        "message": "Sale already recorded" if duplicate else "Sale recorded successfully",
+        "sale_id": str(sale_id),
         "change": change if change is not None else None
     }
 
+@router.post("/batch")
+async def create_sales_batch(
+    batch: SaleBatchCreate,
+    current_user: dict = Depends(get_current_user_from_cookie),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Record sales queued by an offline till; retries never record a sale twice"""
+    keys = [entry.idempotency_key for entry in batch.sales]
+    if len(set(keys)) != len(keys):
+        raise HTTPException(status_code=400, detail="Duplicate idempotency key in batch")
+
+    sales_service = SalesService(db)
+    existing = await sales_service.find_existing_sales(keys)
+    results = [None] * len(batch.sales)
+
+    # Validate every sale against one shared item lookup
+    parsed = []
+    for index, entry in enumerate(batch.sales):
+        if entry.idempotency_key in existing:
+            continue
+        try:
+            parsed.append((index, entry, sales_service.parse_item_ids(entry)))
+        except SaleError as e:
+            results[index] = {"status": "rejected", "detail": e.detail}
+
+    db_items = await sales_service.load_items(
+        item_id for _, _, item_ids in parsed for item_id in item_ids
+    )
+
+    now = datetime.utcnow()
+    pending = []
+    for index, entry, item_ids in parsed:
+        sold_at = now
+        if entry.sold_at:
+            sold_at = entry.sold_at
+            if sold_at.tzinfo:
+                sold_at = sold_at.astimezone(timezone.utc).replace(tzinfo=None)
+            sold_at = min(sold_at, now)
+        try:
+            sale_dict = sales_service.build_sale(entry, item_ids, db_items, current_user, sold_at)
+        except SaleError as e:
+            results[index] = {"status": "rejected", "detail": e.detail}
+            continue
+        sale_dict["idempotency_key"] = entry.idempotency_key
+        pending.append((index, sale_dict))
+
+    # Commit all valid sales together; a short item only rejects the sales it cannot cover
+    committed = []
+    outcomes = await sales_service.commit_sales_independently([sale_dict for _, sale_dict in pending])
+    for (index, sale_dict), outcome in zip(pending, outcomes):
+        if isinstance(outcome, SaleError):
+            results[index] = {"status": "rejected", "detail": outcome.detail}
+        else:
+            committed.append(((index, sale_dict), outcome))
+
+    raced = [sale_dict["idempotency_key"] for (_, sale_dict), sale_id in committed if sale_id is None]
+    if raced:
+        existing.update(await sales_service.find_existing_sales(raced))
+    for (index, sale_dict), sale_id in committed:
+        if sale_id is not None:
+            results[index] = {"status": "created", "sale_id": str(sale_id)}
+
+    for index, entry in enumerate(batch.sales):
+        if results[index] is None:
+            results[index] = {"status": "duplicate", "sale_id": str(existing[entry.idempotency_key])}
+        results[index]["idempotency_key"] = entry.idempotency_key
+
+    return {
+        "created": sum(1 for result in results if result["status"] == "created"),
+        "duplicates": sum(1 for result in results if result["status"] == "duplicate"),
+        "rejected": sum(1 for result in results if result["status"] == "rejected"),
+        "results": results
+    }
+
+@router.get("/history")
+async def get_sales_history(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    operator_id: Optional[str] = None,
+    payment_method: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_current_user_from_cookie),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Sales newest first, paginated on (created_at, _id) so every page is an index range scan"""
+    filters = []
+    if start_date or end_date:
+        created_at = {}
+        if start_date:
+            created_at["$gte"] = start_date
+        if end_date:
+            created_at["$lte"] = end_date
+        filters.append({"created_at": created_at})
+    if operator_id:
+        if not ObjectId.is_valid(operator_id):
+            raise HTTPException(status_code=400, detail="Invalid operator ID")
+        filters.append({"processed_by": ObjectId(operator_id)})
+    if payment_method:
+        if payment_method not in ["cash", "mpesa"]:
+            raise HTTPException(status_code=400, detail="Invalid payment method")
+        filters.append({"payment_method": payment_method})
+    if cursor:
+        try:
+            filters.append(KeysetCursor.after(cursor))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    query = {"$and": filters} if filters else {}
+    sales = await db.sales.find(query).sort(
+        [("created_at", -1), ("_id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(sales) > limit:
+        sales = sales[:limit]
+        next_cursor = KeysetCursor.encode(sales[-1])
+
+    for sale in sales:
+        sale["_id"] = str(sale["_id"])
+        sale["processed_by"] = str(sale["processed_by"])
+        for item in sale["items"]:
+            item["item_id"] = str(item["item_id"])
+    return {"sales": sales, "next": next_cursor}
+
 @router.get("/{sale_id}")
 async def get_sale(
     sale_id: str,
@@ -131,17 +214,3 @@ async def get_sale(
         item["item_id"] = str(item["item_id"])
 
     return sale
-
-@router.get("/history")
-async def get_sales_history(
-    current_user: dict = Depends(get_current_user_from_cookie),
-    db: AsyncIOMotorDatabase = Depends(get_database)
-):
-    sales = []
-    async for sale in db.sales.find():
-        sale["_id"] = str(sale["_id"])
-        sale["processed_by"] = str(sale["processed_by"])
-        for item in sale["items"]:
-            item["item_id"] = str(item["item_id"])
-        sales.append(sale)
-    return sales
\ No newline at end of file
@@ -1,23 +1,30 @@
 # File: services/alert_service.py
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from .sms_service import SMSService, TwilioSMSService
+from .sms_outbox import SMSOutbox, register_renderer
+from .stock_state import LOW_STOCK_QUERY
+from bson import ObjectId
 from datetime import datetime
-from typing import List, Dict
+from typing import Dict, Iterable, List, Optional
+import asyncio
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+LOW_STOCK_ALERT = "low_stock"
+# Safety net for stock changes that bypass the sale and adjustment paths;
+# it only reads items that are low and were never alerted on
+LOW_STOCK_SWEEP_SECONDS = int(os.getenv("LOW_STOCK_SWEEP_SECONDS", "900"))
+
 class AlertService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
-        self.sms_service = SMSService()  # Default to Africa's Talking
-        # self.sms_service = TwilioSMSService()  # Uncomment to use Twilio
         
     async def check_low_stock_alerts(self) -> List[dict]:
         """Check for items with low stock and return alert data"""
         low_stock_items = []
         
-        async for item in self.db.items.find({"$expr": {"$lte": ["$current_stock", "$alert_threshold"]}}):
+        async for item in self.db.items.find(LOW_STOCK_QUERY):
             low_stock_items.append({
                 "item_id": str(item["_id"]),
                 "name": item["name"],
@@ -28,44 +35,141 @@ class AlertService:
         
         return low_stock_items
     
-    async def send_low_stock_alerts(self) -> dict:
-        """Send SMS alerts to managers for low stock items"""
-        low_stock_items = await self.check_low_stock_alerts()
+    async def send_low_stock_alerts(self, low_stock_items: Optional[List[dict]] = None) -> dict:
+        """Send SMS alerts to managers for low stock items.
+
+        Alerts on the given items, or on every low stock item if none are given.
+        """
+        if low_stock_items is None:
+            low_stock_items = await self.check_low_stock_alerts()
         
         if not low_stock_items:
             return {"success": True, "message": "No low stock alerts"}
         
-        # Get all manager phone numbers
-        managers = []
-        async for manager in self.db.users.find({"role": "manager", "is_active": True}):
-            managers.append(manager["phone_number"])
-        
-        if not managers:
-            return {"success": False, "error": "No active managers found"}
-        
-        # Prepare alert message
-        item_list = []
-        for item in low_stock_items:
-            item_list.append(f"• {item['name']}: {item['current_stock']} left (Alert: {item['alert_threshold']})")
-        
-        message = f"🚨 LOW STOCK ALERT - SmartBiz Manager\n\n" \
-                 f"The following items need restocking:\n\n" \
-                 f"{'\\n'.join(item_list[:5])}" \
-                 f"{'\\n...and ' + str(len(item_list) - 5) + ' more items' if len(item_list) > 5 else ''}\n\n" \
-                 f"Please restock soon to avoid stockouts.\n" \
-                 f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-        
-        # Send SMS
-        result = await self.sms_service.send_sms(managers, message)
+        # Delivery happens in the outbox worker, which looks up the managers'
+        # numbers when it sends. Every alert still waiting to be sent merges
+        # into one pending message, rendered when it is sent
+        outbox_id = await SMSOutbox(self.db).enqueue(
+            roles=["manager"],
+            kind=LOW_STOCK_ALERT,
+            entries={item["item_id"]: item for item in low_stock_items}
+        )
+        if outbox_id is None:
+            return {"success": False, "error": "SMS alerts are disabled"}
         
-        # Log the alert
-        await self.db.alert_logs.insert_one({
-            "type": "low_stock",
-            "items": low_stock_items,
-            "recipients": managers,
-            "message": message,
-            "sms_result": result,
-            "created_at": datetime.utcnow()
-        })
-        
-        return result
\ No newline at end of file
+        return {"success": True, "queued": str(outbox_id), "items": len(low_stock_items)}
+
+def render_low_stock_alert(items: Dict[str, Dict]) -> str:
+    item_list = []
+    for item in items.values():
+        item_list.append(f"• {item['name']}: {item['current_stock']} left (Alert: {item['alert_threshold']})")
+    
+    more = f"\n...and {len(item_list) - 5} more items" if len(item_list) > 5 else ""
+    return "🚨 LOW STOCK ALERT - SmartBiz Manager\n\n" \
+           "The following items need restocking:\n\n" \
+           + "\n".join(item_list[:5]) + more + "\n\n" \
+           "Please restock soon to avoid stockouts.\n" \
+           f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+
+register_renderer(LOW_STOCK_ALERT, render_low_stock_alert)
+
+class LowStockMonitor:
+    """Edge-triggered low stock alerts.
+
+    Each item records when it was alerted on in low_stock_alerted_at; the
+    stock write that takes it back above its threshold clears it. Stock
+    writes pass the items they touched, and an alert is queued only for
+    low items whose flag this process manages to set, so every worker
+    alerts on a crossing at most once. A periodic sweep catches low items
+    that were never flagged because they went low through another path.
+    """
+    def __init__(self, sweep_seconds: int):
+        self.sweep_seconds = sweep_seconds
+        self.alerts = 0
+        self.sweeps = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def _claim(db: AsyncIOMotorDatabase, items: Iterable[dict]) -> List[dict]:
+        """Flag the unflagged low items; returns the ones this call flagged"""
+        now = datetime.utcnow()
+        claimed = []
+        for item in items:
+            if item["current_stock"] > item["alert_threshold"] or item.get("low_stock_alerted_at"):
+                continue
+            result = await db.items.update_one(
+                {"_id": item["_id"], **LOW_STOCK_QUERY, "low_stock_alerted_at": None},
+                {"$set": {"low_stock_alerted_at": now}}
+            )
+            if result.modified_count:
+                claimed.append({
+                    "item_id": str(item["_id"]),
+                    "name": item["name"],
+                    "current_stock": item["current_stock"],
+                    "alert_threshold": item["alert_threshold"]
+                })
+        return claimed
+
+    async def _alert(self, db: AsyncIOMotorDatabase, items: List[dict]) -> dict:
+        try:
+            result = await AlertService(db).send_low_stock_alerts(items)
+            if result.get("success"):
+                self.alerts += 1
+            return result
+        except Exception:
+            # Unflag so the next sweep retries the alert
+            await db.items.update_many(
+                {"_id": {"$in": [ObjectId(item["item_id"]) for item in items]}},
+                {"$set": {"low_stock_alerted_at": None}}
+            )
+            raise
+
+    async def record_stock_levels(self, db: AsyncIOMotorDatabase, items: Iterable[dict]):
+        """Queue an alert for items a stock write left at or below their threshold.
+
+        Items need _id, name, current_stock, alert_threshold and
+        low_stock_alerted_at.
+        """
+        try:
+            claimed = await self._claim(db, items)
+            if claimed:
+                await self._alert(db, claimed)
+        except Exception as e:
+            # The stock write succeeded; the next sweep retries the alert
+            logger.error(f"Failed to queue low stock alert: {str(e)}")
+
+    async def sweep(self, db: AsyncIOMotorDatabase) -> dict:
+        """Alert on low items whose crossing was missed"""
+        self.sweeps += 1
+        missed = await db.items.find(
+            {**LOW_STOCK_QUERY, "low_stock_alerted_at": None},
+            {"name": 1, "current_stock": 1, "alert_threshold": 1}
+        ).to_list(None)
+        claimed = await self._claim(db, missed)
+        if not claimed:
+            return {"success": True, "message": "No low stock alerts"}
+        return await self._alert(db, claimed)
+
+    def start(self, db: AsyncIOMotorDatabase):
+        if self._task is None and self.sweep_seconds > 0:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, db: AsyncIOMotorDatabase):
+        while True:
+            await asyncio.sleep(self.sweep_seconds)
+            try:
+                result = await self.sweep(db)
+                logger.info(f"Low stock sweep: {result}")
+            except Exception as e:
+                logger.error(f"Low stock sweep failed: {str(e)}")
+
+    def stats(self) -> Dict:
+        return {"running": self._task is not None, "alerts": self.alerts, "sweeps": self.sweeps}
+
+low_stock_monitor = LowStockMonitor(LOW_STOCK_SWEEP_SECONDS)
@@ -0,0 +1,86 @@
+# File: services/catalog_cache.py
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Each worker keeps its own copy; the TTL bounds how long writes made by
+# other workers take to show up
+CATALOG_CACHE_TTL_SECONDS = int(os.getenv("CATALOG_CACHE_TTL_SECONDS", "60"))
+
+class CatalogCache:
+    """In-process copy of the sellable catalog with a monotonically increasing version.
+
+    The version only moves when the listing served to tills changes, so it
+    doubles as an ETag: unchanged catalogs cost a 304 and no database work.
+    """
+    def __init__(self, ttl_seconds: int):
+        self.ttl = ttl_seconds
+        self.version = 0
+        # Distinguishes this process's versions from other workers'
+        self._epoch = uuid.uuid4().hex[:8]
+        self._items: Dict[ObjectId, dict] = {}
+        self._listing: Optional[List[dict]] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def etag(self) -> str:
+        return f'"{self._epoch}-{self.version}"'
+
+    def _is_fresh(self) -> bool:
+        return self._listing is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def get_listing(self, db: AsyncIOMotorDatabase) -> List[dict]:
+        """Items currently in stock, loading the catalog only when stale"""
+        if not self._is_fresh():
+            async with self._lock:
+                if not self._is_fresh():
+                    await self._load(db)
+        return self._listing
+
+    async def _load(self, db: AsyncIOMotorDatabase):
+        items = {}
+        async for item in db.items.find({}, {"name": 1, "selling_price": 1, "current_stock": 1}):
+            items[item["_id"]] = item
+        self._items = items
+        self._loaded_at = time.monotonic()
+        self._rebuild()
+
+    def _rebuild(self):
+        listing = [
+            {
+                "id": str(item_id),
+                "name": item["name"],
+                "selling_price": item["selling_price"]
+            }
+            for item_id, item in self._items.items()
+            if item["current_stock"] > 0
+        ]
+        if listing != self._listing:
+            self._listing = listing
+            self.version += 1
+
+    def invalidate(self):
+        """Reload on next read; the version only moves if the listing changed"""
+        self._loaded_at = 0.0
+
+    def apply_stock_changes(self, changes: Dict[ObjectId, int]):
+        """Patch stock levels after a committed sale instead of reloading"""
+        if self._listing is None:
+            return
+        for item_id, delta in changes.items():
+            item = self._items.get(item_id)
+            if item is None:
+                self.invalidate()
+                return
+            item["current_stock"] += delta
+        self._rebuild()
+
+catalog_cache = CatalogCache(CATALOG_CACHE_TTL_SECONDS)
@@ -0,0 +1,150 @@
+# File: services/dashboard_service.py
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+import asyncio
+import logging
+import os
+
+from services.event_bus import EventBus, event_bus
+from services.reporting_service import ReportingService
+from services.stock_state import LOW_STOCK_QUERY
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_HEARTBEAT_SECONDS = int(os.getenv("DASHBOARD_HEARTBEAT_SECONDS", "15"))
+# Sales recorded by other worker processes only reach this process's
+# dashboards through the periodic refresh from the database
+DASHBOARD_REFRESH_SECONDS = int(os.getenv("DASHBOARD_REFRESH_SECONDS", "30"))
+
+LOW_STOCK_FIELDS = {"name": 1, "custom_id": 1, "current_stock": 1, "alert_threshold": 1}
+
+class DashboardFeed:
+    """Live manager dashboard state, kept up to date by the writes themselves.
+
+    Sales, stock changes and feedback update the state in place and publish
+    the change on the event bus, so any number of open dashboards share one
+    computation instead of each polling the reports.
+    """
+    def __init__(self, bus: EventBus, refresh_seconds: int):
+        self.bus = bus
+        self.refresh_seconds = refresh_seconds
+        self.day: Optional[datetime] = None
+        self.total_sales = 0
+        self.total_transactions = 0
+        self.low_stock: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _low_stock_entry(item: Dict) -> Dict:
+        return {
+            "item_id": str(item["_id"]),
+            "name": item["name"],
+            "custom_id": item.get("custom_id"),
+            "current_stock": item["current_stock"],
+            "alert_threshold": item["alert_threshold"]
+        }
+
+    def state(self) -> Dict:
+        return {
+            "date": self.day,
+            "total_sales": self.total_sales,
+            "total_transactions": self.total_transactions,
+            "low_stock_items": list(self.low_stock.values())
+        }
+
+    async def load(self, db: AsyncIOMotorDatabase) -> bool:
+        """Reload today's totals and the low stock items; returns whether anything changed"""
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        # Reads the rollups only once they are complete, else scans today's sales
+        report = await ReportingService(db).get_daily_sales_report(today)
+        low_stock = {}
+        async for item in db.items.find(
+            LOW_STOCK_QUERY, LOW_STOCK_FIELDS
+        ):
+            low_stock[str(item["_id"])] = self._low_stock_entry(item)
+
+        before = self.state()
+        self.day = today
+        self.total_sales = report["total_sales"]
+        self.total_transactions = report["total_transactions"]
+        self.low_stock = low_stock
+        return self.state() != before
+
+    async def snapshot(self, db: AsyncIOMotorDatabase) -> Dict:
+        """Current state for a newly connected dashboard"""
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.day != today:
+            await self.load(db)
+        return self.state()
+
+    def record_sales(self, sale_docs: Iterable[dict]):
+        """Add committed sales to the running daily totals"""
+        if self.day is None:
+            return
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.day != today:
+            self.day = today
+            self.total_sales = 0
+            self.total_transactions = 0
+        sales = [sale for sale in sale_docs if sale["created_at"] >= self.day]
+        if not sales:
+            return
+        self.total_sales += sum(sale["final_amount"] for sale in sales)
+        self.total_transactions += len(sales)
+        self.bus.publish("sales", {
+            "total_sales": self.total_sales,
+            "total_transactions": self.total_transactions,
+            "new_sales": len(sales)
+        })
+
+    def record_stock_levels(self, items: Iterable[dict]):
+        """Publish items that just fell to or below their alert threshold.
+
+        Items need _id, name, current_stock and alert_threshold.
+        """
+        if self.day is None:
+            return
+        new_low, restocked = [], []
+        for item in items:
+            item_id = str(item["_id"])
+            if item["current_stock"] <= item["alert_threshold"]:
+                if item_id not in self.low_stock:
+                    new_low.append(self._low_stock_entry(item))
+                self.low_stock[item_id] = self._low_stock_entry(item)
+            elif self.low_stock.pop(item_id, None) is not None:
+                restocked.append(item_id)
+        if new_low or restocked:
+            self.bus.publish("low_stock", {"items": new_low, "restocked": restocked})
+
+    def record_feedback(self, feedback: dict):
+        self.bus.publish("feedback", {
+            "feedback_id": str(feedback["_id"]),
+            "feedback_type": feedback["feedback_type"],
+            "description": feedback["description"],
+            "customer_name": feedback.get("customer_name"),
+            "created_at": feedback["created_at"]
+        })
+
+    def start(self, db: AsyncIOMotorDatabase):
+        if self._task is None and self.refresh_seconds > 0:
+            self._task = asyncio.create_task(self._refresh(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _refresh(self, db: AsyncIOMotorDatabase):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            if not self.bus.subscriber_count:
+                continue
+            try:
+                if await self.load(db):
+                    self.bus.publish("snapshot", self.state())
+            except Exception as e:
+                logger.error(f"Failed to refresh dashboard state: {str(e)}")
+
+dashboard_feed = DashboardFeed(event_bus, DASHBOARD_REFRESH_SECONDS)
@@ -0,0 +1,59 @@
+# File: services/event_bus.py
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_MAX_CONNECTIONS = int(os.getenv("DASHBOARD_MAX_CONNECTIONS", "50"))
+DASHBOARD_QUEUE_SIZE = int(os.getenv("DASHBOARD_QUEUE_SIZE", "100"))
+
+class EventBus:
+    """In-process fan-out of events to subscriber queues.
+
+    Publishing never blocks: a subscriber that falls behind loses its
+    oldest pending events rather than slowing down the publisher.
+    """
+    def __init__(self, max_subscribers: int, queue_size: int):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._subscribers: List[asyncio.Queue] = []
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Optional[asyncio.Queue]:
+        """A new subscriber queue, or None if the subscriber limit is reached"""
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def publish(self, event: str, data: Dict):
+        if not self._subscribers:
+            return
+        self.published += 1
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait((event, data))
+
+    def stats(self) -> Dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "max_subscribers": self.max_subscribers,
+            "published": self.published,
+            "dropped": self.dropped
+        }
+
+event_bus = EventBus(DASHBOARD_MAX_CONNECTIONS, DASHBOARD_QUEUE_SIZE)
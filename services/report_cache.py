@@ -0,0 +1,191 @@
+# File: services/report_cache.py
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+import asyncio
+import json
+import logging
+import os
+
+from services.reporting_service import ReportingService, REPORTS_TIMEZONE
+from services.report_scheduler import ReportSnapshots, snapshot_key, is_closed, start_of_today
+from utils.cache import TTLCache
+from utils.helpers import DateHelper
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "1000"))
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Reports that include today can change with every sale, including sales
+# recorded by other workers, so they are only kept briefly
+REPORT_CACHE_OPEN_TTL_SECONDS = int(os.getenv("REPORT_CACHE_OPEN_TTL_SECONDS", "30"))
+# Closed periods only change through writes other processes make (backdated
+# offline sales, rollup rebuilds, new expenses), which this process cannot
+# see, so they are kept for a bounded time rather than until evicted
+REPORT_CACHE_CLOSED_TTL_SECONDS = int(os.getenv("REPORT_CACHE_CLOSED_TTL_SECONDS", "900"))
+
+def _naive_utc(date: datetime) -> datetime:
+    if date.tzinfo:
+        return date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+class ReportCache:
+    """Report results keyed by report and period.
+
+    Reports over fully elapsed days are kept for closed_ttl_seconds;
+    reports covering today expire after a short TTL. Sales recorded by this
+    process drop the reports of the days they touch, and identical
+    concurrent requests share one computation.
+    """
+    def __init__(self, max_entries: int, max_bytes: int, open_ttl_seconds: int, closed_ttl_seconds: int):
+        self.open_ttl = open_ttl_seconds
+        self.closed_ttl = closed_ttl_seconds
+        self.coalesced = 0
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=None, max_bytes=max_bytes)
+        self._periods: Dict[Hashable, tuple] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        start: datetime,
+        end: datetime,
+        compute: Callable[[], Awaitable]
+    ):
+        """Cached result for a report over [start, end), computing it at most once at a time"""
+        result = self._cache.get(key)
+        if result is not None:
+            return result
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        task = asyncio.ensure_future(compute())
+        self._inflight[key] = task
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            self._inflight.pop(key, None)
+
+        start, end = _naive_utc(start), _naive_utc(end)
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        ttl = self.closed_ttl if end <= today else self.open_ttl
+        self._cache.set(key, result, ttl, size=len(json.dumps(result, default=str)))
+        self._periods[key] = (start, end)
+        return result
+
+    def invalidate_dates(self, dates: Iterable[datetime]):
+        """Drop cached reports whose period contains any of the given times"""
+        dates = list(dates)
+        for key in self._cache.keys():
+            start, end = self._periods.get(key, (None, None))
+            if start is None or any(start <= date < end for date in dates):
+                self._cache.invalidate(key)
+                self._periods.pop(key, None)
+        # Forget periods of entries the LRU already evicted
+        live = set(self._cache.keys())
+        for key in [key for key in self._periods if key not in live]:
+            del self._periods[key]
+
+    def stats(self) -> Dict:
+        return {**self._cache.stats(), "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+report_cache = ReportCache(
+    REPORT_CACHE_MAX_ENTRIES, REPORT_CACHE_MAX_BYTES, REPORT_CACHE_OPEN_TTL_SECONDS, REPORT_CACHE_CLOSED_TTL_SECONDS
+)
+
+class CachedReportingService(ReportingService):
+    """ReportingService with date-based reports served through report_cache.
+
+    Reports over closed periods precomputed by the report scheduler are
+    served from their snapshot instead of being computed. The current
+    week's report combines the snapshots of its closed days with today's
+    figures, and the inventory report is always computed live.
+    """
+
+    async def _from_snapshot(self, key: str, period_end: datetime, compute: Callable[[], Awaitable]):
+        report = None
+        if is_closed(period_end):
+            report = await ReportSnapshots(self.db).get(key)
+        if report is None:
+            report = await compute()
+        return report
+
+    async def get_daily_sales_report(self, date: Optional[datetime] = None, top_n: int = 5) -> Dict:
+        start_of_day = (date or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+        return await report_cache.get_or_compute(
+            ("daily", start_of_day, top_n),
+            start_of_day,
+            start_of_day + timedelta(days=1),
+            lambda: self._from_snapshot(
+                snapshot_key("daily", start_of_day, top_n),
+                start_of_day + timedelta(days=1),
+                lambda: super(CachedReportingService, self).get_daily_sales_report(start_of_day, top_n)
+            )
+        )
+
+    async def get_weekly_sales_report(self, start_date: Optional[datetime] = None) -> Dict:
+        if not start_date:
+            today = datetime.utcnow()
+            start_date = today - timedelta(days=today.weekday())
+        start_of_week = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_of_week = start_of_week + timedelta(days=7)
+        if is_closed(end_of_week):
+            compute = lambda: self._from_snapshot(
+                snapshot_key("weekly", start_of_week),
+                end_of_week,
+                lambda: super(CachedReportingService, self).get_weekly_sales_report(start_of_week)
+            )
+        else:
+            compute = lambda: self._open_weekly_sales_report(start_of_week)
+        return await report_cache.get_or_compute(("weekly", start_of_week), start_of_week, end_of_week, compute)
+
+    async def _open_weekly_sales_report(self, start_of_week: datetime) -> Dict:
+        """A week that has not ended: closed days from their snapshots, the rest computed"""
+        closed_days = max(0, min(7, (start_of_today() - start_of_week).days))
+        days = [start_of_week + timedelta(days=offset) for offset in range(7)]
+        keys = [snapshot_key("daily", day, 5) for day in days[:closed_days]]
+        snapshots = await ReportSnapshots(self.db).get_many(keys) if keys else {}
+
+        # Days without a snapshot, normally only today onwards, in one computation
+        first_missing = next((offset for offset, key in enumerate(keys) if key not in snapshots), closed_days)
+        computed = await super().get_daily_sales_reports(days[first_missing], 7 - first_missing)
+        return self._weekly_report(start_of_week, [snapshots[key] for key in keys[:first_missing]] + computed)
+
+    async def get_operator_performance(self, start_date: datetime, end_date: datetime) -> List[Dict]:
+        return await report_cache.get_or_compute(
+            ("operator_performance", start_date, end_date),
+            start_date,
+            end_date + timedelta(microseconds=1),
+            lambda: self._from_snapshot(
+                snapshot_key("operator_performance", start_date, end_date),
+                end_date + timedelta(microseconds=1),
+                lambda: super(CachedReportingService, self).get_operator_performance(start_date, end_date)
+            )
+        )
+
+    async def get_sales_timeseries(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        granularity: str = "day",
+        timezone: Optional[str] = None
+    ) -> Dict:
+        tz = DateHelper.get_timezone(timezone or REPORTS_TIMEZONE)
+        first = DateHelper.truncate(start_date, granularity, tz)
+        end = DateHelper.next_bucket(DateHelper.truncate(end_date, granularity, tz), granularity)
+        return await report_cache.get_or_compute(
+            ("timeseries", first, end, granularity, tz.key),
+            first,
+            end,
+            lambda: super(CachedReportingService, self).get_sales_timeseries(start_date, end_date, granularity, tz.key)
+        )
+
+    async def get_profit_report(self, start_date: datetime, end_date: datetime) -> Dict:
+        return await report_cache.get_or_compute(
+            ("profit", start_date, end_date),
+            start_date,
+            end_date + timedelta(microseconds=1),
+            lambda: super(CachedReportingService, self).get_profit_report(start_date, end_date)
+        )
@@ -0,0 +1,193 @@
+# File: services/report_scheduler.py
+"""Background precomputation of the slow reports.
+
+Jobs run in-process on the event loop, started and stopped by main.py, and
+store their results in the report_snapshots collection. The reporting
+endpoints serve a snapshot when one exists for the requested period instead
+of computing the report on the request.
+
+Only closed periods are snapshotted: their reports only change when a
+backdated sale lands in them, which drops the affected snapshots. Reports
+over the current week combine closed-day snapshots with today's figures.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List
+import asyncio
+import logging
+import os
+import time
+
+from services.reporting_service import ReportingService
+from utils.helpers import DateHelper
+
+logger = logging.getLogger(__name__)
+
+REPORT_SCHEDULER_ENABLED = os.getenv("REPORT_SCHEDULER_ENABLED", "true").lower() == "true"
+# Seconds between runs of each job
+REPORT_JOB_INTERVALS = {
+    "daily": int(os.getenv("REPORT_JOB_DAILY_INTERVAL_SECONDS", "3600")),
+    "weekly": int(os.getenv("REPORT_JOB_WEEKLY_INTERVAL_SECONDS", "3600")),
+    "operator_performance": int(os.getenv("REPORT_JOB_OPERATOR_PERFORMANCE_INTERVAL_SECONDS", "3600")),
+}
+
+def snapshot_key(*parts) -> str:
+    return ":".join(part.isoformat() if isinstance(part, datetime) else str(part) for part in parts)
+
+def start_of_today() -> datetime:
+    return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+def is_closed(period_end: datetime) -> bool:
+    """Whether a period ending at period_end (exclusive) has fully elapsed"""
+    return period_end <= start_of_today()
+
+class ReportSnapshots:
+    """Precomputed reports stored in report_snapshots, keyed by report and period"""
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+    async def get(self, key: str):
+        """The stored report, or None if there is no snapshot"""
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: List[str]) -> Dict:
+        """Stored reports by key, for the keys that have a snapshot"""
+        # Snapshots from before only closed periods were stored carry an expiry
+        return {
+            snapshot["_id"]: snapshot["report"]
+            async for snapshot in self.db.report_snapshots.find(
+                {"_id": {"$in": keys}, "expires_at": None}, {"report": 1}
+            )
+        }
+
+    async def save(self, key: str, report, period_start: datetime, period_end: datetime, duration_ms: float):
+        if not is_closed(period_end):
+            raise ValueError(f"Report snapshot {key} covers a period that has not ended")
+        await self.db.report_snapshots.replace_one(
+            {"_id": key},
+            {
+                "report": report,
+                "period_start": period_start,
+                "period_end": period_end,
+                "computed_at": datetime.utcnow(),
+                "duration_ms": duration_ms,
+                "expires_at": None
+            },
+            upsert=True
+        )
+
+    async def invalidate_dates(self, dates: Iterable[datetime]):
+        """Drop snapshots of periods containing any of the given times.
+
+        Only backdated times can fall in a snapshotted period, so sales
+        recorded today cost nothing here.
+        """
+        today = start_of_today()
+        dates = sorted({date for date in dates if date < today})
+        if not dates:
+            return
+        await self.db.report_snapshots.delete_many({"$or": [
+            {"period_start": {"$lte": date}, "period_end": {"$gt": date}} for date in dates
+        ]})
+
+class ReportScheduler:
+    """Runs each report job on its own interval and records how long it took"""
+    def __init__(self, intervals: Dict[str, int]):
+        self.intervals = intervals
+        self.job_stats: Dict[str, Dict] = {
+            name: {"runs": 0, "failures": 0, "last_run": None, "last_duration_ms": None, "max_duration_ms": 0}
+            for name in intervals
+        }
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self, db: AsyncIOMotorDatabase):
+        if self._tasks:
+            return
+        jobs = {
+            "daily": self._daily,
+            "weekly": self._weekly,
+            "operator_performance": self._operator_performance,
+        }
+        for name, interval in self.intervals.items():
+            if interval > 0:
+                self._tasks.append(asyncio.create_task(self._run(name, jobs[name], interval, db)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, name: str, job: Callable[[AsyncIOMotorDatabase], Awaitable], interval: int, db: AsyncIOMotorDatabase):
+        while True:
+            started = time.perf_counter()
+            stats = self.job_stats[name]
+            try:
+                await job(db)
+                duration_ms = (time.perf_counter() - started) * 1000
+                stats["runs"] += 1
+                stats["last_run"] = datetime.utcnow()
+                stats["last_duration_ms"] = duration_ms
+                stats["max_duration_ms"] = max(stats["max_duration_ms"], duration_ms)
+                logger.info(f"Report job {name} finished in {duration_ms:.0f}ms")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats["failures"] += 1
+                logger.error(f"Report job {name} failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+    @staticmethod
+    async def _snapshot(
+        db: AsyncIOMotorDatabase,
+        key: str,
+        period_start: datetime,
+        period_end: datetime,
+        compute: Callable[[], Awaitable]
+    ):
+        """Compute and store a closed period's report unless it is already stored"""
+        snapshots = ReportSnapshots(db)
+        if await snapshots.get(key) is not None:
+            return
+        started = time.perf_counter()
+        report = await compute()
+        await snapshots.save(key, report, period_start, period_end, (time.perf_counter() - started) * 1000)
+
+    async def _daily(self, db: AsyncIOMotorDatabase):
+        """Yesterday and the closed days of the current week, which the
+        current week's report combines with today's figures"""
+        today = start_of_today()
+        start_of_week, _ = DateHelper.get_week_range()
+        first_day = min(start_of_week, today - timedelta(days=1))
+        for offset in range((today - first_day).days):
+            day = first_day + timedelta(days=offset)
+            await self._snapshot(
+                db, snapshot_key("daily", day, 5), day, day + timedelta(days=1),
+                lambda: ReportingService(db).get_daily_sales_report(day, 5)
+            )
+
+    async def _weekly(self, db: AsyncIOMotorDatabase):
+        """Last week, the most recent closed one"""
+        start_of_week = DateHelper.get_week_range()[0] - timedelta(days=7)
+        await self._snapshot(
+            db, snapshot_key("weekly", start_of_week), start_of_week, start_of_week + timedelta(days=7),
+            lambda: ReportingService(db).get_weekly_sales_report(start_of_week)
+        )
+
+    async def _operator_performance(self, db: AsyncIOMotorDatabase):
+        """Last week, Monday 00:00 to Sunday 23:59:59"""
+        start_of_week, end_of_week = (date - timedelta(days=7) for date in DateHelper.get_week_range())
+        await self._snapshot(
+            db, snapshot_key("operator_performance", start_of_week, end_of_week),
+            start_of_week, start_of_week + timedelta(days=7),
+            lambda: ReportingService(db).get_operator_performance(start_of_week, end_of_week)
+        )
+
+    def stats(self) -> Dict:
+        return {"running": self.running, "intervals": self.intervals, "jobs": self.job_stats}
+
+report_scheduler = ReportScheduler(REPORT_JOB_INTERVALS)
@@ -1,40 +1,95 @@
 # File: services/reporting_service.py
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 from bson import ObjectId
+import asyncio
 import logging
+import os
+
+from services.rollup_service import (
+    SalesRollupService, rollup_status, LINE_COST, LINE_DISCOUNT, LINE_UNCOSTED_QUANTITY, LINE_UNCOSTED_REVENUE,
+    SALE_COST, SALE_UNCOSTED_QUANTITY, SALE_UNCOSTED_REVENUE
+)
+from services.stock_state import LOW_STOCK_QUERY, STOCK_OUT
+from utils.cache import TTLCache
+from utils.helpers import DateHelper, KeysetCursor
 
 logger = logging.getLogger(__name__)
 
+# Read sales reports from sales_daily_rollups instead of scanning raw sales,
+# once they are complete. On an existing database that means after running
+# `python -m services.rollup_service rebuild`; until then reports scan sales.
+# Set to false to always scan sales.
+REPORTS_USE_ROLLUPS = os.getenv("REPORTS_USE_ROLLUPS", "true").lower() == "true"
+
+# Shops are in Nairobi; time series are bucketed on local boundaries
+REPORTS_TIMEZONE = os.getenv("REPORTS_TIMEZONE", "Africa/Nairobi")
+TIMESERIES_MAX_BUCKETS = int(os.getenv("TIMESERIES_MAX_BUCKETS", "1000"))
+
+UNKNOWN_OPERATOR_NAME = "Unknown operator"
+
+FEEDBACK_FIELDS = {
+    "feedback_type": 1,
+    "description": 1,
+    "customer_name": 1,
+    "status": 1,
+    "created_at": 1
+}
+
+# Operator names rarely change and reports only need them for display
+operator_name_cache = TTLCache(max_entries=1000, ttl_seconds=600)
+
 class ReportingService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
+
+    async def _use_rollups(self) -> bool:
+        return REPORTS_USE_ROLLUPS and await rollup_status.complete(self.db)
     
-    async def get_daily_sales_report(self, date: Optional[datetime] = None) -> Dict:
-        """Generate daily sales report"""
+    async def get_daily_sales_report(self, date: Optional[datetime] = None, top_n: int = 5) -> Dict:
+        """Generate daily sales report with the top_n best selling items"""
         if not date:
             date = datetime.utcnow()
         
         start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
         end_of_day = start_of_day + timedelta(days=1)
         
+        if await self._use_rollups():
+            return (await self.get_daily_sales_reports(start_of_day, 1, top_n))[0]
+        
+        # Totals and top sellers share one scan of the day's sales
         pipeline = [
             {"$match": {"created_at": {"$gte": start_of_day, "$lt": end_of_day}}},
-            {"$group": {
-                "_id": None,
-                "total_sales": {"$sum": "$final_amount"},
-                "total_transactions": {"$sum": 1},
-                "cash_sales": {"$sum": {"$cond": [{"$eq": ["$payment_method", "cash"]}, "$final_amount", 0]}},
-                "mpesa_sales": {"$sum": {"$cond": [{"$eq": ["$payment_method", "mpesa"]}, "$final_amount", 0]}},
-                "total_discount": {"$sum": "$discount_amount"},
-                "total_items_sold": {"$sum": {"$sum": "$items.quantity"}}
+            {"$facet": {
+                "summary": [
+                    {"$group": {
+                        "_id": None,
+                        "total_sales": {"$sum": "$final_amount"},
+                        "total_transactions": {"$sum": 1},
+                        "cash_sales": {"$sum": {"$cond": [{"$eq": ["$payment_method", "cash"]}, "$final_amount", 0]}},
+                        "mpesa_sales": {"$sum": {"$cond": [{"$eq": ["$payment_method", "mpesa"]}, "$final_amount", 0]}},
+                        "total_discount": {"$sum": "$discount_amount"},
+                        "total_items_sold": {"$sum": {"$sum": "$items.quantity"}}
+                    }}
+                ],
+                "top_selling_items": [
+                    {"$unwind": "$items"},
+                    {"$group": {
+                        "_id": "$items.item_id",
+                        "item_name": {"$first": "$items.item_name"},
+                        "total_quantity": {"$sum": "$items.quantity"},
+                        "total_revenue": {"$sum": "$items.total_price"}
+                    }},
+                    {"$sort": {"total_quantity": -1}},
+                    {"$limit": top_n}
+                ]
             }}
         ]
         
-        result = await self.db.sales.aggregate(pipeline).to_list(1)
+        result = (await self.db.sales.aggregate(pipeline).to_list(1))[0]
         
-        if not result:
+        if not result["summary"]:
             return {
                 "date": start_of_day,
                 "total_sales": 0,
@@ -46,31 +101,116 @@ class ReportingService:
                 "top_selling_items": []
             }
         
-        report = result[0]
+        report = result["summary"][0]
         report["date"] = start_of_day
         del report["_id"]
-        
-        # Get top selling items for the day
-        top_items_pipeline = [
-            {"$match": {"created_at": {"$gte": start_of_day, "$lt": end_of_day}}},
-            {"$unwind": "$items"},
-            {"$group": {
-                "_id": "$items.item_id",
-                "item_name": {"$first": "$items.item_name"},
-                "total_quantity": {"$sum": "$items.quantity"},
-                "total_revenue": {"$sum": "$items.total_price"}
-            }},
-            {"$sort": {"total_quantity": -1}},
-            {"$limit": 5}
-        ]
-        
-        top_items = await self.db.sales.aggregate(top_items_pipeline).to_list(5)
         report["top_selling_items"] = [
-            {**item, "_id": str(item["_id"])} for item in top_items
+            {**item, "_id": str(item["_id"])} for item in result["top_selling_items"]
         ]
         
         return report
     
+    async def get_daily_sales_reports(self, start_date: datetime, days: int, top_n: int = 5) -> List[Dict]:
+        """Daily sales reports for a range of days, computed in one aggregation"""
+        start_of_range = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_of_range = start_of_range + timedelta(days=days)
+        
+        if await self._use_rollups():
+            rollups = await SalesRollupService(self.db).get_rollups(start_of_range, days)
+            return [
+                self._report_from_rollup(start_of_range + timedelta(days=i), rollups.get(start_of_range + timedelta(days=i)), top_n)
+                for i in range(days)
+            ]
+        day = {"$dateTrunc": {"date": "$created_at", "unit": "day"}}
+        
+        pipeline = [
+            {"$match": {"created_at": {"$gte": start_of_range, "$lt": end_of_range}}},
+            {"$facet": {
+                "summary": [
+                    {"$group": {
+                        "_id": day,
+                        "total_sales": {"$sum": "$final_amount"},
+                        "total_transactions": {"$sum": 1},
+                        "cash_sales": {"$sum": {"$cond": [{"$eq": ["$payment_method", "cash"]}, "$final_amount", 0]}},
+                        "mpesa_sales": {"$sum": {"$cond": [{"$eq": ["$payment_method", "mpesa"]}, "$final_amount", 0]}},
+                        "total_discount": {"$sum": "$discount_amount"},
+                        "total_items_sold": {"$sum": {"$sum": "$items.quantity"}}
+                    }}
+                ],
+                "top_selling_items": [
+                    {"$unwind": "$items"},
+                    {"$group": {
+                        "_id": {"day": day, "item_id": "$items.item_id"},
+                        "item_name": {"$first": "$items.item_name"},
+                        "total_quantity": {"$sum": "$items.quantity"},
+                        "total_revenue": {"$sum": "$items.total_price"}
+                    }},
+                    {"$sort": {"total_quantity": -1}},
+                    {"$group": {
+                        "_id": "$_id.day",
+                        "items": {"$push": {
+                            "_id": "$_id.item_id",
+                            "item_name": "$item_name",
+                            "total_quantity": "$total_quantity",
+                            "total_revenue": "$total_revenue"
+                        }}
+                    }},
+                    {"$project": {"items": {"$slice": ["$items", top_n]}}}
+                ]
+            }}
+        ]
+        
+        result = (await self.db.sales.aggregate(pipeline).to_list(1))[0]
+        summaries = {summary.pop("_id"): summary for summary in result["summary"]}
+        top_items = {entry["_id"]: entry["items"] for entry in result["top_selling_items"]}
+        
+        # Fill days without sales so the range is dense
+        reports = []
+        for i in range(days):
+            date = start_of_range + timedelta(days=i)
+            report = summaries.get(date, {
+                "total_sales": 0,
+                "total_transactions": 0,
+                "cash_sales": 0,
+                "mpesa_sales": 0,
+                "total_discount": 0,
+                "total_items_sold": 0
+            })
+            report["date"] = date
+            report["top_selling_items"] = [
+                {**item, "_id": str(item["_id"])} for item in top_items.get(date, [])
+            ]
+            reports.append(report)
+        
+        return reports
+    
+    @staticmethod
+    def _report_from_rollup(date: datetime, rollup: Optional[dict], top_n: int) -> Dict:
+        """Shape a daily rollup document like an aggregated daily report"""
+        rollup = rollup or {}
+        top_items = sorted(
+            rollup.get("items", {}).items(),
+            key=lambda entry: entry[1]["quantity"],
+            reverse=True
+        )[:top_n]
+        return {
+            "total_sales": rollup.get("total_sales", 0),
+            "total_transactions": rollup.get("total_transactions", 0),
+            "cash_sales": rollup.get("cash_sales", 0),
+            "mpesa_sales": rollup.get("mpesa_sales", 0),
+            "total_discount": rollup.get("total_discount", 0),
+            "total_items_sold": rollup.get("total_items_sold", 0),
+            "date": date,
+            "top_selling_items": [
+                {
+                    "_id": item_id,
+                    "item_name": item["item_name"],
+                    "total_quantity": item["quantity"],
+                    "total_revenue": item["revenue"]
+                } for item_id, item in top_items
+            ]
+        }
+    
     async def get_weekly_sales_report(self, start_date: Optional[datetime] = None) -> Dict:
         """Generate weekly sales report"""
         if not start_date:
@@ -78,39 +218,165 @@ class ReportingService:
             start_date = today - timedelta(days=today.weekday())  # Start of current week
         
         start_of_week = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_week = start_of_week + timedelta(days=7)
-        
-        daily_reports = []
-        total_weekly_sales = 0
-        
-        for i in range(7):
-            day = start_of_week + timedelta(days=i)
-            daily_report = await self.get_daily_sales_report(day)
-            daily_reports.append(daily_report)
-            total_weekly_sales += daily_report["total_sales"]
-        
+        return self._weekly_report(start_of_week, await self.get_daily_sales_reports(start_of_week, 7))
+    
+    @staticmethod
+    def _weekly_report(start_of_week: datetime, daily_reports: List[Dict]) -> Dict:
+        total_weekly_sales = sum(report["total_sales"] for report in daily_reports)
         return {
             "week_start": start_of_week,
-            "week_end": end_of_week,
+            "week_end": start_of_week + timedelta(days=7),
             "daily_reports": daily_reports,
             "total_weekly_sales": total_weekly_sales,
             "average_daily_sales": total_weekly_sales / 7 if total_weekly_sales > 0 else 0
         }
     
+    async def get_sales_timeseries(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        granularity: str = "day",
+        timezone: Optional[str] = None
+    ) -> Dict:
+        """Sales totals per local hour/day/week/month, with empty buckets included.
+
+        Buckets run from the one containing start_date to the one containing
+        end_date; naive dates are taken as local time in timezone.
+        """
+        tz = DateHelper.get_timezone(timezone or REPORTS_TIMEZONE)
+        buckets = DateHelper.get_buckets(start_date, end_date, granularity, tz, TIMESERIES_MAX_BUCKETS)
+        range_start = DateHelper.to_utc(buckets[0])
+        range_end = DateHelper.to_utc(DateHelper.next_bucket(buckets[-1], granularity))
+        
+        pipeline = [
+            {"$match": {"created_at": {"$gte": range_start, "$lt": range_end}}},
+            {"$group": {
+                "_id": {"$dateTrunc": {
+                    "date": "$created_at",
+                    "unit": granularity,
+                    "timezone": tz.key,
+                    "startOfWeek": "monday"
+                }},
+                "total_sales": {"$sum": "$final_amount"},
+                "total_transactions": {"$sum": 1},
+                "cash_sales": {"$sum": {"$cond": [{"$eq": ["$payment_method", "cash"]}, "$final_amount", 0]}},
+                "mpesa_sales": {"$sum": {"$cond": [{"$eq": ["$payment_method", "mpesa"]}, "$final_amount", 0]}},
+                "total_items_sold": {"$sum": {"$sum": "$items.quantity"}}
+            }}
+        ]
+        
+        totals = {}
+        async for bucket in self.db.sales.aggregate(pipeline):
+            totals[bucket.pop("_id")] = bucket
+        
+        series = []
+        for bucket in buckets:
+            entry = totals.get(DateHelper.to_utc(bucket), {})
+            total_sales = entry.get("total_sales", 0)
+            total_transactions = entry.get("total_transactions", 0)
+            series.append({
+                "start": bucket,
+                "total_sales": total_sales,
+                "total_transactions": total_transactions,
+                "cash_sales": entry.get("cash_sales", 0),
+                "mpesa_sales": entry.get("mpesa_sales", 0),
+                "total_items_sold": entry.get("total_items_sold", 0),
+                "average_transaction": total_sales / total_transactions if total_transactions else 0
+            })
+        
+        return {
+            "granularity": granularity,
+            "timezone": tz.key,
+            "start": buckets[0],
+            "end": DateHelper.next_bucket(buckets[-1], granularity),
+            "series": series
+        }
+    
+    async def _operator_names(self, operator_ids: Iterable[str]) -> Dict[str, str]:
+        """Full names for operator IDs, loading only those not already cached.
+
+        Operators whose user record was deleted are still reported, under a
+        placeholder name.
+        """
+        names = {}
+        missing = []
+        for operator_id in operator_ids:
+            name = operator_name_cache.get(operator_id)
+            if name is None:
+                missing.append(operator_id)
+            else:
+                names[operator_id] = name
+        
+        if missing:
+            async for user in self.db.users.find(
+                {"_id": {"$in": [ObjectId(operator_id) for operator_id in missing if ObjectId.is_valid(operator_id)]}},
+                {"full_name": 1}
+            ):
+                names[str(user["_id"])] = user["full_name"]
+                operator_name_cache.set(str(user["_id"]), user["full_name"])
+            for operator_id in missing:
+                names.setdefault(operator_id, UNKNOWN_OPERATOR_NAME)
+        
+        return names
+    
+    @staticmethod
+    def _whole_days(start_date: datetime, end_date: datetime) -> Optional[tuple]:
+        """(first day, number of days) if the range covers whole days, else None"""
+        start_of_day = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if start_date != start_of_day:
+            return None
+        end_of_day = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if end_date == end_of_day:
+            days = (end_of_day - start_of_day).days
+        elif end_date.time() >= datetime.max.time().replace(microsecond=0):
+            # Inclusive ends such as 23:59:59 from DateHelper
+            days = (end_of_day - start_of_day).days + 1
+        else:
+            return None
+        return (start_of_day, days) if days > 0 else None
+    
+    async def _get_operator_performance_from_rollups(
+        self, start_of_range: datetime, days: int, start_date: datetime, end_date: datetime
+    ) -> List[Dict]:
+        rollups = await SalesRollupService(self.db).get_rollups(start_of_range, days)
+        totals: Dict[str, Dict] = {}
+        for rollup in rollups.values():
+            for operator_id, operator in rollup.get("operators", {}).items():
+                entry = totals.setdefault(operator_id, {"total_sales": 0, "total_transactions": 0, "total_items_sold": 0})
+                for field in entry:
+                    entry[field] += operator.get(field, 0)
+        
+        names = await self._operator_names(totals)
+        
+        operators = [
+            {
+                "operator_name": names[operator_id],
+                "total_sales": entry["total_sales"],
+                "total_transactions": entry["total_transactions"],
+                "average_transaction": entry["total_sales"] / entry["total_transactions"],
+                "total_items_sold": entry["total_items_sold"],
+                "operator_id": operator_id,
+                "period_start": start_date,
+                "period_end": end_date
+            }
+            for operator_id, entry in totals.items()
+            if entry["total_transactions"]
+        ]
+        operators.sort(key=lambda operator: operator["total_sales"], reverse=True)
+        return operators
+    
     async def get_operator_performance(self, start_date: datetime, end_date: datetime) -> List[Dict]:
         """Get operator performance report"""
+        whole_days = self._whole_days(start_date, end_date)
+        if whole_days and await self._use_rollups():
+            return await self._get_operator_performance_from_rollups(*whole_days, start_date, end_date)
+        
+        # Group first so the cost follows the number of operators, not sales;
+        # names are joined afterwards
         pipeline = [
             {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
-            {"$lookup": {
-                "from": "users",
-                "localField": "processed_by",
-                "foreignField": "_id",
-                "as": "operator"
-            }},
-            {"$unwind": "$operator"},
             {"$group": {
                 "_id": "$processed_by",
-                "operator_name": {"$first": "$operator.full_name"},
                 "total_sales": {"$sum": "$final_amount"},
                 "total_transactions": {"$sum": 1},
                 "average_transaction": {"$avg": "$final_amount"},
@@ -120,14 +386,20 @@ class ReportingService:
         ]
         
         operators = await self.db.sales.aggregate(pipeline).to_list(None)
+        names = await self._operator_names(str(operator["_id"]) for operator in operators)
         
-        for operator in operators:
-            operator["operator_id"] = str(operator["_id"])
-            operator["period_start"] = start_date
-            operator["period_end"] = end_date
-            del operator["_id"]
-        
-        return operators
+        return [
+            {
+                "operator_name": names[str(operator["_id"])],
+                "total_sales": operator["total_sales"],
+                "total_transactions": operator["total_transactions"],
+                "average_transaction": operator["average_transaction"],
+                "total_items_sold": operator["total_items_sold"],
+                "operator_id": str(operator["_id"]),
+                "period_start": start_date,
+                "period_end": end_date
+            } for operator in operators
+        ]
     
     async def get_inventory_report(self) -> Dict:
         """Generate inventory status report"""
@@ -135,9 +407,7 @@ class ReportingService:
             {"$group": {
                 "_id": None,
                 "total_items": {"$sum": 1},
-                "total_stock_value": {"$sum": {"$multiply": ["$current_stock", "$selling_price"]}},
-                "low_stock_items": {"$sum": {"$cond": [{"$lte": ["$current_stock", "$alert_threshold"]}, 1, 0]}},
-                "out_of_stock_items": {"$sum": {"$cond": [{"$eq": ["$current_stock", 0]}, 1, 0]}}
+                "total_stock_value": {"$sum": {"$multiply": ["$current_stock", "$selling_price"]}}
             }}
         ]
         
@@ -154,6 +424,16 @@ class ReportingService:
         
         report = result[0]
         del report["_id"]
+        # Counted from the stock_state index rather than compared per item
+        states = {
+            state["_id"]: state["count"]
+            async for state in self.db.items.aggregate([
+                {"$match": LOW_STOCK_QUERY},
+                {"$group": {"_id": "$stock_state", "count": {"$sum": 1}}}
+            ])
+        }
+        report["low_stock_items"] = sum(states.values())
+        report["out_of_stock_items"] = states.get(STOCK_OUT, 0)
         
         # Get category breakdown
         category_pipeline = [
@@ -200,36 +480,247 @@ class ReportingService:
             ]
         }
     
-    async def get_customer_feedback_report(self, start_date: datetime, end_date: datetime) -> Dict:
-        """Generate customer feedback report for a given period"""
+    @staticmethod
+    def _profit(revenue: float, cogs: float, uncosted_quantity: int = 0, uncosted_revenue: float = 0) -> Dict:
+        """Profit figures; the margin only covers revenue from lines with a known cost,
+        and is None when no line had one"""
+        gross_profit = revenue - cogs
+        costed_revenue = revenue - uncosted_revenue
+        if costed_revenue > 0:
+            gross_margin = ((costed_revenue - cogs) / costed_revenue) * 100
+        else:
+            gross_margin = None if uncosted_quantity else 0
+        return {
+            "revenue": revenue,
+            "cogs": cogs,
+            "gross_profit": gross_profit,
+            "gross_margin": gross_margin,
+            "uncosted_quantity": uncosted_quantity,
+            "uncosted_revenue": uncosted_revenue
+        }
+    
+    async def get_profit_report(self, start_date: datetime, end_date: datetime) -> Dict:
+        """Revenue, cost of goods sold, expenses and net profit per day, category and item.
+
+        Revenue is net of discounts and costs come from the buying prices
+        snapshotted on each sale line. Lines sold without any known cost are
+        reported as uncosted_quantity and uncosted_revenue rather than as
+        free stock.
+        """
+        day = {"$dateTrunc": {"date": "$created_at", "unit": "day"}}
+        date_range = {"created_at": {"$gte": start_date, "$lte": end_date}}
+        expenses_by_day = [{"$group": {"_id": day, "expenses": {"$sum": "$amount"}}}]
+        
+        whole_days = self._whole_days(start_date, end_date)
+        if whole_days and await self._use_rollups():
+            rollups = await SalesRollupService(self.db).get_rollups(*whole_days)
+            sales_by_day = [
+                {
+                    "_id": rollup_day,
+                    "revenue": rollup["total_sales"],
+                    "cogs": rollup.get("total_cost", 0),
+                    "uncosted_quantity": rollup.get("uncosted_quantity", 0),
+                    "uncosted_revenue": rollup.get("uncosted_revenue", 0)
+                }
+                for rollup_day, rollup in rollups.items()
+            ]
+            items = {}
+            for rollup in rollups.values():
+                for item_id, entry in rollup.get("items", {}).items():
+                    item = items.setdefault(item_id, {
+                        "_id": item_id, "quantity": 0, "revenue": 0, "cogs": 0,
+                        "uncosted_quantity": 0, "uncosted_revenue": 0
+                    })
+                    item["item_name"] = entry["item_name"]
+                    item["category"] = entry.get("category")
+                    item["quantity"] += entry["quantity"]
+                    item["revenue"] += entry["revenue"] - entry.get("discount", 0)
+                    item["cogs"] += entry.get("cost", 0)
+                    item["uncosted_quantity"] += entry.get("uncosted_quantity", 0)
+                    item["uncosted_revenue"] += entry.get("uncosted_revenue", 0)
+            items = list(items.values())
+            expenses = await self.db.expenses.aggregate(
+                [{"$match": date_range}] + expenses_by_day
+            ).to_list(None)
+        else:
+            # Sales and expenses are read in one aggregation; $unionWith
+            # keeps the expenses' own created_at index in play
+            pipeline = [
+                {"$match": date_range},
+                {"$unionWith": {"coll": "expenses", "pipeline": [
+                    {"$match": date_range},
+                    {"$project": {"created_at": 1, "amount": 1, "is_expense": {"$literal": True}}}
+                ]}},
+                {"$facet": {
+                    "sales_by_day": [
+                        {"$match": {"is_expense": {"$exists": False}}},
+                        {"$group": {
+                            "_id": day,
+                            "revenue": {"$sum": "$final_amount"},
+                            "cogs": {"$sum": SALE_COST},
+                            "uncosted_quantity": {"$sum": SALE_UNCOSTED_QUANTITY},
+                            "uncosted_revenue": {"$sum": SALE_UNCOSTED_REVENUE}
+                        }}
+                    ],
+                    "items": [
+                        {"$match": {"is_expense": {"$exists": False}}},
+                        {"$unwind": "$items"},
+                        {"$group": {
+                            "_id": "$items.item_id",
+                            "item_name": {"$last": "$items.item_name"},
+                            "category": {"$last": "$items.category"},
+                            "quantity": {"$sum": "$items.quantity"},
+                            "revenue": {"$sum": {"$subtract": ["$items.total_price", LINE_DISCOUNT]}},
+                            "cogs": {"$sum": LINE_COST},
+                            "uncosted_quantity": {"$sum": LINE_UNCOSTED_QUANTITY},
+                            "uncosted_revenue": {"$sum": LINE_UNCOSTED_REVENUE}
+                        }}
+                    ],
+                    "expenses_by_day": [{"$match": {"is_expense": True}}] + expenses_by_day
+                }}
+            ]
+            result = (await self.db.sales.aggregate(pipeline, allowDiskUse=True).to_list(1))[0]
+            sales_by_day, items, expenses = result["sales_by_day"], result["items"], result["expenses_by_day"]
+        
+        profit_fields = ("revenue", "cogs", "uncosted_quantity", "uncosted_revenue")
+        days = {}
+        for entry in sales_by_day:
+            days[entry["_id"]] = {**{field: entry[field] for field in profit_fields}, "expenses": 0}
+        for entry in expenses:
+            days.setdefault(
+                entry["_id"], {**{field: 0 for field in profit_fields}, "expenses": 0}
+            )["expenses"] = entry["expenses"]
+        
+        categories = {}
+        for item in items:
+            category = categories.setdefault(
+                item["category"] or "Uncategorized", {"quantity": 0, **{field: 0 for field in profit_fields}}
+            )
+            for field in ("quantity",) + profit_fields:
+                category[field] += item[field]
+        
+        totals = {field: sum(entry[field] for entry in days.values()) for field in profit_fields}
+        revenue, cogs = totals["revenue"], totals["cogs"]
+        total_expenses = sum(entry["expenses"] for entry in days.values())
+        
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            **self._profit(**totals),
+            "expenses": total_expenses,
+            "net_profit": revenue - cogs - total_expenses,
+            "by_day": [
+                {
+                    "date": date,
+                    **self._profit(*(entry[field] for field in profit_fields)),
+                    "expenses": entry["expenses"],
+                    "net_profit": entry["revenue"] - entry["cogs"] - entry["expenses"]
+                } for date, entry in sorted(days.items())
+            ],
+            "by_category": sorted(
+                [
+                    {
+                        "category": name,
+                        "quantity": entry["quantity"],
+                        **self._profit(*(entry[field] for field in profit_fields))
+                    }
+                    for name, entry in categories.items()
+                ],
+                key=lambda entry: entry["gross_profit"],
+                reverse=True
+            ),
+            "by_item": sorted(
+                [
+                    {
+                        "item_id": str(item["_id"]),
+                        "item_name": item["item_name"],
+                        "category": item["category"],
+                        "quantity": item["quantity"],
+                        **self._profit(*(item[field] for field in profit_fields))
+                    } for item in items
+                ],
+                key=lambda entry: entry["gross_profit"],
+                reverse=True
+            )
+        }
+    
+    async def get_customer_feedback_report(
+        self, start_date: datetime, end_date: datetime, sample_size: int = 5
+    ) -> Dict:
+        """Feedback counts per type and status with the most recent entries of each type.
+
+        The response size is bounded by sample_size; full details are paged
+        through get_customer_feedback_details.
+        """
+        date_range = {"created_at": {"$gte": start_date, "$lte": end_date}}
         pipeline = [
-            {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
+            {"$match": date_range},
             {"$group": {
-                "_id": "$feedback_type",
-                "count": {"$sum": 1},
-                "details": {"$push": {
-                    "description": "$description",
-                    "customer_name": "$customer_name",
-                    "status": "$status",
-                    "created_at": "$created_at"
-                }}
-            }},
-            {"$sort": {"count": -1}}
+                "_id": {"type": "$feedback_type", "status": "$status"},
+                "count": {"$sum": 1}
+            }}
         ]
         
-        feedback = await self.db.customer_feedback.aggregate(pipeline).to_list(None)
+        breakdown = {}
+        async for entry in self.db.customer_feedback.aggregate(pipeline):
+            feedback_type = breakdown.setdefault(
+                entry["_id"]["type"],
+                {"type": entry["_id"]["type"], "count": 0, "status_counts": {}, "recent": []}
+            )
+            feedback_type["count"] += entry["count"]
+            feedback_type["status_counts"][entry["_id"]["status"]] = entry["count"]
         
-        total_feedback = sum(item["count"] for item in feedback)
+        # One indexed (feedback_type, created_at) range read per type
+        async def recent(feedback_type: str) -> List[Dict]:
+            return await self.db.customer_feedback.find(
+                {"feedback_type": feedback_type, **date_range},
+                FEEDBACK_FIELDS
+            ).sort([("created_at", -1), ("_id", -1)]).limit(sample_size).to_list(sample_size)
+        
+        if sample_size:
+            samples = await asyncio.gather(*(recent(feedback_type) for feedback_type in breakdown))
+            for feedback_type, sample in zip(breakdown.values(), samples):
+                feedback_type["recent"] = [self._feedback_entry(entry) for entry in sample]
         
         return {
             "start_date": start_date,
             "end_date": end_date,
-            "total_feedback": total_feedback,
-            "feedback_breakdown": [
-                {
-                    "type": item["_id"],
-                    "count": item["count"],
-                    "details": item["details"]
-                } for item in feedback
-            ]
+            "total_feedback": sum(entry["count"] for entry in breakdown.values()),
+            "feedback_breakdown": sorted(breakdown.values(), key=lambda entry: entry["count"], reverse=True)
         }
+    
+    async def get_customer_feedback_details(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        feedback_type: Optional[str] = None,
+        status: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Dict:
+        """One page of feedback in a period, newest first"""
+        filters = [{"created_at": {"$gte": start_date, "$lte": end_date}}]
+        if feedback_type:
+            filters.append({"feedback_type": feedback_type})
+        if status:
+            filters.append({"status": status})
+        if cursor:
+            filters.append(KeysetCursor.after(cursor))
+        
+        feedback = await self.db.customer_feedback.find(
+            {"$and": filters}, FEEDBACK_FIELDS
+        ).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1).to_list(limit + 1)
+        
+        next_cursor = None
+        if len(feedback) > limit:
+            feedback = feedback[:limit]
+            next_cursor = KeysetCursor.encode(feedback[-1])
+        
+        return {
+            "feedback": [self._feedback_entry(entry) for entry in feedback],
+            "next": next_cursor
+        }
+    
+    @staticmethod
+    def _feedback_entry(entry: Dict) -> Dict:
+        return {**entry, "_id": str(entry["_id"])}
@@ -0,0 +1,316 @@
+# File: services/rollup_service.py
+"""Incrementally maintained per-day sales totals.
+
+Every committed sale $inc's the rollup document of its day, so reports read
+one small document per day instead of scanning raw sales. To backfill or
+repair rollups from the sales history:
+
+    python -m services.rollup_service rebuild [YYYY-MM-DD [YYYY-MM-DD]]
+
+The rebuild only rewrites closed days, stopping before today, so it can run
+while sales are being recorded: today's rollup is left to the sales' own
+increments, which a rewrite would race with.
+
+Reports only use the rollups once they are known to be complete: after a
+full rebuild that finds today's rollup counting every sale so far (run it
+the day after deploying if it does not), or on a database whose first sale
+already updated them. A failed rollup update marks them incomplete again
+until the next full rebuild.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne, ReplaceOne
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_STATE_ID = "sales_daily_rollups"
+# How long a worker trusts its last read of the shared rollup state
+ROLLUP_STATE_RECHECK_SECONDS = int(os.getenv("ROLLUP_STATE_RECHECK_SECONDS", "60"))
+
+class RollupStatus:
+    """Whether sales_daily_rollups is complete, shared by all workers through
+    the rollup_state collection, plus this process's update failure counts"""
+    def __init__(self, recheck_seconds: int):
+        self.recheck_seconds = recheck_seconds
+        self.failures = 0
+        self.failed_sales = 0
+        self._complete: Optional[bool] = None
+        self._checked_at = 0.0
+
+    async def complete(self, db: AsyncIOMotorDatabase) -> bool:
+        if self._complete is not None and time.monotonic() - self._checked_at < self.recheck_seconds:
+            return self._complete
+        state = await db.rollup_state.find_one({"_id": ROLLUP_STATE_ID})
+        if state is None and await db.sales.find_one({}, {"_id": 1}) is None:
+            # No sales yet: every future sale updates its rollup, so they start complete
+            await self.mark_complete(db)
+            state = {"complete": True}
+        self._complete = bool(state and state.get("complete"))
+        self._checked_at = time.monotonic()
+        return self._complete
+
+    async def mark_complete(self, db: AsyncIOMotorDatabase):
+        await db.rollup_state.update_one(
+            {"_id": ROLLUP_STATE_ID},
+            {"$set": {"complete": True, "completed_at": datetime.utcnow()}},
+            upsert=True
+        )
+        self._complete = True
+        self._checked_at = time.monotonic()
+
+    async def record_failure(self, db: AsyncIOMotorDatabase, sales: int):
+        """Count a failed rollup update and stop reports using the rollups"""
+        self.failures += 1
+        self.failed_sales += sales
+        self._complete = False
+        self._checked_at = time.monotonic()
+        try:
+            await db.rollup_state.update_one(
+                {"_id": ROLLUP_STATE_ID},
+                {"$set": {"complete": False, "failed_at": datetime.utcnow()}, "$inc": {"failed_sales": sales}},
+                upsert=True
+            )
+        except Exception as e:
+            # Other workers keep using the rollups until they see a failure themselves
+            logger.error(f"Failed to mark daily rollups incomplete: {str(e)}")
+
+    def stats(self) -> Dict:
+        return {"complete": self._complete, "failures": self.failures, "failed_sales": self.failed_sales}
+
+rollup_status = RollupStatus(ROLLUP_STATE_RECHECK_SECONDS)
+
+def day_of(date: datetime) -> datetime:
+    return date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def line_cost(line: dict) -> float:
+    """Cost of goods for a sale line; uncosted lines count as 0 and are reported separately"""
+    return line["quantity"] * (line.get("unit_cost") or 0)
+
+def line_uncosted(line: dict) -> bool:
+    """Lines whose item had no buying or supplier price when sold, or that
+    were recorded before costs were snapshotted"""
+    return line.get("unit_cost") is None
+
+# Aggregation equivalents of line_cost and of a line's share of its sale's discount
+LINE_COST = {"$multiply": ["$items.quantity", {"$ifNull": ["$items.unit_cost", 0]}]}
+LINE_DISCOUNT = {"$multiply": [
+    "$items.total_price",
+    {"$divide": [{"$ifNull": ["$discount_percentage", 0]}, 100]}
+]}
+LINE_UNCOSTED = {"$eq": [{"$ifNull": ["$items.unit_cost", None]}, None]}
+LINE_UNCOSTED_QUANTITY = {"$cond": [LINE_UNCOSTED, "$items.quantity", 0]}
+LINE_UNCOSTED_REVENUE = {"$cond": [LINE_UNCOSTED, {"$subtract": ["$items.total_price", LINE_DISCOUNT]}, 0]}
+SALE_COST = {"$sum": {"$map": {
+    "input": "$items",
+    "as": "line",
+    "in": {"$multiply": ["$$line.quantity", {"$ifNull": ["$$line.unit_cost", 0]}]}
+}}}
+_SALE_LINE_UNCOSTED = {"$eq": [{"$ifNull": ["$$line.unit_cost", None]}, None]}
+SALE_UNCOSTED_QUANTITY = {"$sum": {"$map": {
+    "input": "$items",
+    "as": "line",
+    "in": {"$cond": [_SALE_LINE_UNCOSTED, "$$line.quantity", 0]}
+}}}
+SALE_UNCOSTED_REVENUE = {"$sum": {"$map": {
+    "input": "$items",
+    "as": "line",
+    "in": {"$cond": [
+        _SALE_LINE_UNCOSTED,
+        {"$multiply": [
+            "$$line.total_price",
+            {"$subtract": [1, {"$divide": [{"$ifNull": ["$discount_percentage", 0]}, 100]}]}
+        ]},
+        0
+    ]}
+}}}
+
+class SalesRollupService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+    @staticmethod
+    def rollup_updates(sale_docs: List[dict]) -> List[UpdateOne]:
+        """Upserts adding each sale to the rollup document of its day"""
+        increments: Dict[datetime, Dict] = {}
+        names: Dict[datetime, Dict] = {}
+        for sale in sale_docs:
+            day = day_of(sale["created_at"])
+            inc = increments.setdefault(day, {})
+            items_sold = sum(line["quantity"] for line in sale["items"])
+            operator = f"operators.{sale['processed_by']}"
+
+            for field, value in (
+                ("total_sales", sale["final_amount"]),
+                ("total_transactions", 1),
+                (f"{sale['payment_method']}_sales", sale["final_amount"]),
+                ("total_discount", sale["discount_amount"]),
+                ("total_items_sold", items_sold),
+                ("total_cost", sum(line_cost(line) for line in sale["items"])),
+                ("uncosted_quantity", sum(line["quantity"] for line in sale["items"] if line_uncosted(line))),
+                ("uncosted_revenue", sum(
+                    line["total_price"] * (1 - sale.get("discount_percentage", 0) / 100)
+                    for line in sale["items"] if line_uncosted(line)
+                )),
+                (f"{operator}.total_sales", sale["final_amount"]),
+                (f"{operator}.total_transactions", 1),
+                (f"{operator}.total_items_sold", items_sold),
+            ):
+                inc[field] = inc.get(field, 0) + value
+
+            for line in sale["items"]:
+                item = f"items.{line['item_id']}"
+                discount = line["total_price"] * sale.get("discount_percentage", 0) / 100
+                for field, value in (
+                    ("quantity", line["quantity"]),
+                    ("revenue", line["total_price"]),
+                    ("discount", discount),
+                    ("cost", line_cost(line)),
+                    ("uncosted_quantity", line["quantity"] if line_uncosted(line) else 0),
+                    ("uncosted_revenue", line["total_price"] - discount if line_uncosted(line) else 0),
+                ):
+                    inc[f"{item}.{field}"] = inc.get(f"{item}.{field}", 0) + value
+                names.setdefault(day, {})[f"{item}.item_name"] = line["item_name"]
+                names[day][f"{item}.category"] = line.get("category")
+
+        now = datetime.utcnow()
+        return [
+            UpdateOne(
+                {"_id": day},
+                {"$inc": inc, "$set": {**names.get(day, {}), "updated_at": now}},
+                upsert=True
+            )
+            for day, inc in increments.items()
+        ]
+
+    async def apply(self, sale_docs: List[dict], session=None):
+        """Add committed sales to their daily rollups"""
+        updates = self.rollup_updates(sale_docs)
+        if updates:
+            await self.db.sales_daily_rollups.bulk_write(updates, ordered=False, session=session)
+
+    async def get_rollups(self, start_day: datetime, days: int) -> Dict[datetime, dict]:
+        """Rollup documents for a range of days, keyed by day"""
+        rollups = {}
+        async for rollup in self.db.sales_daily_rollups.find(
+            {"_id": {"$gte": start_day, "$lt": start_day + timedelta(days=days)}}
+        ):
+            rollups[rollup["_id"]] = rollup
+        return rollups
+
+    async def rebuild(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> int:
+        """Recompute rollups for whole closed days from raw sales; returns the number of days written"""
+        today = day_of(datetime.utcnow())
+        end = min(day_of(end_date) + timedelta(days=1), today) if end_date else today
+        match = {"created_at": {"$lt": end}}
+        if start_date:
+            match["created_at"]["$gte"] = day_of(start_date)
+        day = {"$dateTrunc": {"date": "$created_at", "unit": "day"}}
+
+        totals_pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": day,
+                "total_sales": {"$sum": "$final_amount"},
+                "total_transactions": {"$sum": 1},
+                "cash_sales": {"$sum": {"$cond": [{"$eq": ["$payment_method", "cash"]}, "$final_amount", 0]}},
+                "mpesa_sales": {"$sum": {"$cond": [{"$eq": ["$payment_method", "mpesa"]}, "$final_amount", 0]}},
+                "total_discount": {"$sum": "$discount_amount"},
+                "total_items_sold": {"$sum": {"$sum": "$items.quantity"}},
+                "total_cost": {"$sum": SALE_COST},
+                "uncosted_quantity": {"$sum": SALE_UNCOSTED_QUANTITY},
+                "uncosted_revenue": {"$sum": SALE_UNCOSTED_REVENUE}
+            }}
+        ]
+        items_pipeline = [
+            {"$match": match},
+            {"$unwind": "$items"},
+            {"$group": {
+                "_id": {"day": day, "item_id": "$items.item_id"},
+                "item_name": {"$last": "$items.item_name"},
+                "category": {"$last": "$items.category"},
+                "quantity": {"$sum": "$items.quantity"},
+                "revenue": {"$sum": "$items.total_price"},
+                "discount": {"$sum": LINE_DISCOUNT},
+                "cost": {"$sum": LINE_COST},
+                "uncosted_quantity": {"$sum": LINE_UNCOSTED_QUANTITY},
+                "uncosted_revenue": {"$sum": LINE_UNCOSTED_REVENUE}
+            }}
+        ]
+        operators_pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"day": day, "operator_id": "$processed_by"},
+                "total_sales": {"$sum": "$final_amount"},
+                "total_transactions": {"$sum": 1},
+                "total_items_sold": {"$sum": {"$sum": "$items.quantity"}}
+            }}
+        ]
+
+        rollups: Dict[datetime, dict] = {}
+        async for totals in self.db.sales.aggregate(totals_pipeline, allowDiskUse=True):
+            rollups[totals["_id"]] = {**totals, "items": {}, "operators": {}}
+        async for item in self.db.sales.aggregate(items_pipeline, allowDiskUse=True):
+            rollups[item["_id"]["day"]]["items"][str(item["_id"]["item_id"])] = {
+                "item_name": item["item_name"],
+                "category": item["category"],
+                "quantity": item["quantity"],
+                "revenue": item["revenue"],
+                "discount": item["discount"],
+                "cost": item["cost"],
+                "uncosted_quantity": item["uncosted_quantity"],
+                "uncosted_revenue": item["uncosted_revenue"]
+            }
+        async for operator in self.db.sales.aggregate(operators_pipeline, allowDiskUse=True):
+            rollups[operator["_id"]["day"]]["operators"][str(operator["_id"]["operator_id"])] = {
+                "total_sales": operator["total_sales"],
+                "total_transactions": operator["total_transactions"],
+                "total_items_sold": operator["total_items_sold"]
+            }
+
+        now = datetime.utcnow()
+        writes = [
+            ReplaceOne({"_id": day}, {**rollup, "updated_at": now}, upsert=True)
+            for day, rollup in rollups.items()
+        ]
+        for i in range(0, len(writes), 500):
+            await self.db.sales_daily_rollups.bulk_write(writes[i:i + 500], ordered=False)
+
+        # Days in the range that no longer have sales
+        await self.db.sales_daily_rollups.delete_many({"_id": {"$nin": list(rollups), **match["created_at"]}})
+
+        if start_date is None and end_date is None:
+            if await self._today_complete(today):
+                await rollup_status.mark_complete(self.db)
+            else:
+                logger.warning("Today's rollup misses sales recorded before it was maintained; rebuild again tomorrow")
+        return len(rollups)
+
+    async def _today_complete(self, today: datetime) -> bool:
+        """Whether today's rollup counts every sale recorded today so far"""
+        rollup = await self.db.sales_daily_rollups.find_one({"_id": today}, {"total_transactions": 1}) or {}
+        sales = await self.db.sales.count_documents({"created_at": {"$gte": today}})
+        return rollup.get("total_transactions", 0) == sales
+
+async def _main(args: List[str]) -> int:
+    from models.database import connect_to_mongo, close_mongo_connection, get_database
+
+    dates = [datetime.strptime(arg, "%Y-%m-%d") for arg in args]
+    await connect_to_mongo(ensure_indexes=False)
+    try:
+        days = await SalesRollupService(await get_database()).rebuild(*dates)
+        print(f"Rebuilt {days} daily rollups")
+        return 0
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild" or len(sys.argv) > 4:
+        print("usage: python -m services.rollup_service rebuild [YYYY-MM-DD [YYYY-MM-DD]]")
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(sys.argv[2:])))
@@ -0,0 +1,430 @@
+# File: services/sales_service.py
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Union
+import asyncio
+import logging
+import os
+
+from models.schemas import SaleCreate
+from services.catalog_cache import catalog_cache
+from services.alert_service import low_stock_monitor
+from services.dashboard_service import dashboard_feed, LOW_STOCK_FIELDS
+from services.rollup_service import SalesRollupService, rollup_status
+from services.report_cache import report_cache
+from services.report_scheduler import ReportSnapshots
+from services.stock_state import stock_update
+from utils.validators import Validators
+
+logger = logging.getLogger(__name__)
+
+# Multi-document transactions need a replica set; standalone servers fall
+# back to conditional decrements with compensation on failure.
+SALES_USE_TRANSACTIONS = os.getenv("SALES_USE_TRANSACTIONS", "false").lower() == "true"
+
+# Group commit buffers validated sales and writes them with one insert_many
+SALES_GROUP_COMMIT = os.getenv("SALES_GROUP_COMMIT", "false").lower() == "true"
+SALES_GROUP_COMMIT_INTERVAL_MS = int(os.getenv("SALES_GROUP_COMMIT_INTERVAL_MS", "5"))
+SALES_GROUP_COMMIT_BATCH_SIZE = int(os.getenv("SALES_GROUP_COMMIT_BATCH_SIZE", "100"))
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Returned by each stock decrement, so low stock crossings need no extra read
+STOCK_LEVEL_FIELDS = {**LOW_STOCK_FIELDS, "low_stock_alerted_at": 1}
+
+class SaleError(Exception):
+    """A sale that cannot be recorded, carrying the HTTP status to report"""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+class InsufficientStockError(SaleError):
+    def __init__(self, item_names: List[str]):
+        names = ", ".join(item_names) or "one or more items"
+        super().__init__(400, f"Insufficient stock for {names}")
+
+class SalesService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+    @staticmethod
+    def parse_item_ids(sale: SaleCreate) -> List[ObjectId]:
+        """Validate and convert the item IDs of every line in a sale"""
+        item_ids = []
+        for item in sale.items:
+            if not ObjectId.is_valid(item["item_id"]):
+                raise SaleError(400, f"Invalid item ID: {item['item_id']}")
+            item_ids.append(ObjectId(item["item_id"]))
+        return item_ids
+
+    async def load_items(self, item_ids: Iterable[ObjectId]) -> Dict[ObjectId, dict]:
+        """Resolve items for any number of sale lines in a single round trip"""
+        db_items = {}
+        async for db_item in self.db.items.find(
+            {"_id": {"$in": list(set(item_ids))}},
+            {
+                "name": 1, "selling_price": 1, "buying_price": 1, "category": 1,
+                "supplier_prices.buying_price": 1, "supplier_prices.last_updated": 1
+            }
+        ):
+            db_items[db_item["_id"]] = db_item
+        return db_items
+
+    @staticmethod
+    def unit_cost(db_item: dict) -> Optional[float]:
+        """The item's buying price, else its most recently updated supplier
+        price; None if it has neither"""
+        if db_item.get("buying_price"):
+            return db_item["buying_price"]
+        prices = [price for price in db_item.get("supplier_prices") or [] if price.get("buying_price")]
+        if not prices:
+            return None
+        # Prices added without a timestamp count as older; ties go to the one added last
+        _, latest = max(enumerate(prices), key=lambda entry: (entry[1].get("last_updated") or datetime.min, entry[0]))
+        return latest["buying_price"]
+
+    @staticmethod
+    def build_sale(
+        sale: SaleCreate,
+        item_ids: List[ObjectId],
+        db_items: Dict[ObjectId, dict],
+        current_user: dict,
+        now: datetime
+    ) -> dict:
+        """Validate a sale against the catalog and build its sales document"""
+        # Validate MPESA reference if payment method is MPESA
+        if sale.payment_method == "mpesa" and sale.mpesa_reference:
+            if not Validators.validate_mpesa_reference(sale.mpesa_reference):
+                raise SaleError(400, "Invalid MPESA reference format")
+
+        # Stock itself is checked atomically by the conditional decrement in commit_sales
+        total_amount = 0
+        sale_items = []
+        for item, item_id in zip(sale.items, item_ids):
+            db_item = db_items.get(item_id)
+            if not db_item:
+                raise SaleError(404, f"Item not found: {item['item_id']}")
+
+            # Validate unit price matches current selling price
+            if item["unit_price"] != db_item["selling_price"]:
+                raise SaleError(400, f"Price mismatch for {db_item['name']}")
+
+            total_price = item["quantity"] * item["unit_price"]
+            total_amount += total_price
+
+            # Cost and category are snapshotted so profit reports stay correct
+            # after buying prices or categories change
+            sale_items.append({
+                "item_id": item_id,
+                "item_name": db_item["name"],
+                "category": db_item.get("category"),
+                "quantity": item["quantity"],
+                "unit_price": item["unit_price"],
+                "total_price": total_price,
+                "unit_cost": SalesService.unit_cost(db_item)
+            })
+
+        # Calculate discounts and final amount
+        discount_amount = total_amount * (sale.discount_percentage / 100)
+        final_amount = total_amount - discount_amount
+
+        # Only managers can apply discounts
+        if sale.discount_percentage > 0 and current_user["role"] != "manager":
+            raise SaleError(403, "Only managers can apply discounts")
+
+        return {
+            "items": sale_items,
+            "total_amount": total_amount,
+            "discount_percentage": sale.discount_percentage,
+            "discount_amount": discount_amount,
+            "final_amount": final_amount,
+            "payment_method": sale.payment_method,
+            "mpesa_reference": sale.mpesa_reference,
+            "customer_name": sale.customer_name,
+            "created_at": now,
+            "processed_by": current_user["_id"]
+        }
+
+    @staticmethod
+    def _quantities(sale_docs: List[dict]) -> Dict[ObjectId, int]:
+        """Total quantity per item across sales, summing repeated lines"""
+        quantities = {}
+        for sale_doc in sale_docs:
+            for line in sale_doc["items"]:
+                quantities[line["item_id"]] = quantities.get(line["item_id"], 0) + line["quantity"]
+        return quantities
+
+    @staticmethod
+    def _item_names(sale_docs: List[dict]) -> Dict[ObjectId, str]:
+        return {line["item_id"]: line["item_name"] for sale_doc in sale_docs for line in sale_doc["items"]}
+
+    @staticmethod
+    def _stock_update(item_id: ObjectId, quantity: int, now: datetime) -> tuple:
+        """Filter and update that decrement stock only if enough is left, so
+        concurrent tills cannot oversell"""
+        return (
+            {"_id": item_id, "current_stock": {"$gte": quantity}},
+            stock_update({"updated_at": now}, {"current_stock": {"$subtract": ["$current_stock", quantity]}})
+        )
+
+    async def _release_stock(self, quantities: Dict[ObjectId, int]):
+        """Give back stock reserved by sales that could not be completed"""
+        if not quantities:
+            return
+        await self.db.items.bulk_write([
+            UpdateOne({"_id": item_id}, stock_update({}, {"current_stock": {"$add": ["$current_stock", quantity]}}))
+            for item_id, quantity in quantities.items()
+        ], ordered=False)
+
+    async def _short_items(self, quantities: Dict[ObjectId, int], names: Dict[ObjectId, str]) -> List[str]:
+        """Names of items whose current stock cannot cover the requested quantity"""
+        short = []
+        async for item in self.db.items.find({"_id": {"$in": list(quantities)}}, {"current_stock": 1}):
+            if item["current_stock"] < quantities[item["_id"]]:
+                short.append(names[item["_id"]])
+        return short
+
+    async def find_existing_sales(self, idempotency_keys: List[str]) -> Dict[str, ObjectId]:
+        """Map already recorded idempotency keys to their sale IDs"""
+        existing = {}
+        async for sale in self.db.sales.find(
+            {"idempotency_key": {"$in": idempotency_keys}},
+            {"idempotency_key": 1}
+        ):
+            existing[sale["idempotency_key"]] = sale["_id"]
+        return existing
+
+    async def commit_sales(self, sale_docs: List[dict]) -> List[Optional[ObjectId]]:
+        """Reserve stock for and insert sales as one unit.
+
+        Returns the inserted ID of each sale, or None for sales whose
+        idempotency key was already recorded. Raises InsufficientStockError,
+        leaving stock untouched, if any line cannot be reserved.
+        """
+        if not sale_docs:
+            return []
+        if SALES_USE_TRANSACTIONS:
+            sale_ids, levels = await self._commit_in_transaction(sale_docs)
+            committed = [sale_doc for sale_doc, sale_id in zip(sale_docs, sale_ids) if sale_id is not None]
+        else:
+            sale_ids, levels = await self._commit_with_compensation(sale_docs)
+            committed = [sale_doc for sale_doc, sale_id in zip(sale_docs, sale_ids) if sale_id is not None]
+            try:
+                await SalesRollupService(self.db).apply(committed)
+            except Exception as e:
+                # The sales are recorded; reports scan sales until a rebuild repairs the rollups
+                logger.error(f"Failed to update daily rollups for {len(committed)} sales: {str(e)}")
+                await rollup_status.record_failure(self.db, len(committed))
+
+        sold = self._quantities(committed)
+        catalog_cache.apply_stock_changes({item_id: -quantity for item_id, quantity in sold.items()})
+        # Snapshots first, so a report recomputed in between cannot be cached from a stale one
+        await ReportSnapshots(self.db).invalidate_dates(sale_doc["created_at"] for sale_doc in committed)
+        report_cache.invalidate_dates(sale_doc["created_at"] for sale_doc in committed)
+        dashboard_feed.record_sales(committed)
+        if levels:
+            dashboard_feed.record_stock_levels(levels)
+            await low_stock_monitor.record_stock_levels(self.db, levels)
+        return sale_ids
+
+    async def commit_sales_independently(self, sale_docs: List[dict]) -> List[Union[ObjectId, None, SaleError]]:
+        """Commit sales together, falling back to one at a time if stock runs short.
+
+        Returns, per sale, its inserted ID, None for an already recorded
+        idempotency key, or the InsufficientStockError that rejected it, so one
+        short item only rejects the sales it cannot cover.
+        """
+        try:
+            return await self.commit_sales(sale_docs)
+        except InsufficientStockError:
+            pass
+
+        results = []
+        for sale_doc in sale_docs:
+            try:
+                results.append((await self.commit_sales([sale_doc]))[0])
+            except InsufficientStockError as e:
+                results.append(e)
+        return results
+
+    async def _decrement_stock(self, item_id: ObjectId, quantity: int, now: datetime, session=None) -> Optional[dict]:
+        """The item's stock fields after reserving quantity, or None if too little is left"""
+        return await self.db.items.find_one_and_update(
+            *self._stock_update(item_id, quantity, now),
+            projection=STOCK_LEVEL_FIELDS,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+
+    async def _commit_in_transaction(self, sale_docs: List[dict]) -> tuple:
+        """(inserted ID or None per sale, stock fields of the decremented items)"""
+        inserted = []
+        levels = []
+
+        async def callback(session):
+            # Drop sales another request already recorded; a concurrent insert of
+            # the same key surfaces as a write conflict and the callback is retried
+            to_insert = sale_docs
+            keys = [doc["idempotency_key"] for doc in sale_docs if "idempotency_key" in doc]
+            if keys:
+                existing = set()
+                async for sale in self.db.sales.find(
+                    {"idempotency_key": {"$in": keys}}, {"idempotency_key": 1}, session=session
+                ):
+                    existing.add(sale["idempotency_key"])
+                to_insert = [doc for doc in sale_docs if doc.get("idempotency_key") not in existing]
+
+            # One operation at a time: a session cannot run operations concurrently
+            now = datetime.utcnow()
+            decremented = []
+            for item_id, quantity in self._quantities(to_insert).items():
+                level = await self._decrement_stock(item_id, quantity, now, session=session)
+                if level is None:
+                    raise InsufficientStockError([])
+                decremented.append(level)
+            if to_insert:
+                await self.db.sales.insert_many(to_insert, session=session)
+                await SalesRollupService(self.db).apply(to_insert, session=session)
+            inserted[:] = to_insert
+            levels[:] = decremented
+
+        async with await self.db.client.start_session() as session:
+            try:
+                await session.with_transaction(callback)
+            except InsufficientStockError:
+                quantities = self._quantities(sale_docs)
+                raise InsufficientStockError(await self._short_items(quantities, self._item_names(sale_docs)))
+
+        inserted_ids = {id(doc) for doc in inserted}
+        return [doc["_id"] if id(doc) in inserted_ids else None for doc in sale_docs], levels
+
+    async def _commit_with_compensation(self, sale_docs: List[dict]) -> tuple:
+        """(inserted ID or None per sale, stock fields of the decremented items)"""
+        quantities = self._quantities(sale_docs)
+        item_ids = list(quantities)
+        now = datetime.utcnow()
+        results = await asyncio.gather(*[
+            self._decrement_stock(item_id, quantities[item_id], now)
+            for item_id in item_ids
+        ])
+        levels = [level for level in results if level is not None]
+        reserved = {level["_id"]: quantities[level["_id"]] for level in levels}
+        if len(reserved) != len(item_ids):
+            await self._release_stock(reserved)
+            names = self._item_names(sale_docs)
+            raise InsufficientStockError([names[item_id] for item_id in item_ids if item_id not in reserved])
+
+        try:
+            await self.db.sales.insert_many(sale_docs, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details["writeErrors"]
+            failed = {error["index"] for error in errors}
+            released = self._quantities([sale_docs[i] for i in failed])
+            await self._release_stock(released)
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            # Released items are no longer at the returned level; the sweep covers them
+            levels = [level for level in levels if level["_id"] not in released]
+            return [None if i in failed else doc["_id"] for i, doc in enumerate(sale_docs)], levels
+        except Exception:
+            await self._release_stock(reserved)
+            raise
+
+        return [doc["_id"] for doc in sale_docs], levels
+
+class SaleCommitter:
+    """Group commit for sale ingestion.
+
+    Requests enqueue validated sale documents and await their own result; a
+    background task flushes the queue every flush_interval_ms or as soon as
+    batch_size sales are waiting, whichever comes first.
+    """
+    def __init__(self, flush_interval_ms: int, batch_size: int):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._service: Optional[SalesService] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self, db: AsyncIOMotorDatabase):
+        self._service = SalesService(db)
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Sale group commit started (interval {self.flush_interval * 1000:g}ms, batch {self.batch_size})"
+        )
+
+    async def stop(self):
+        """Flush whatever is queued and stop the background task"""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        self._full.set()
+        await self._task
+        self._task = None
+
+    async def submit(self, sale_doc: dict) -> Optional[ObjectId]:
+        """Queue a sale for the next flush and wait for its outcome"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((sale_doc, future))
+        if self._queue.qsize() >= self.batch_size:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+
+            if self._queue.qsize() + 1 < self.batch_size:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = [first]
+            stopping = False
+            while len(batch) < self.batch_size and not self._queue.empty():
+                entry = self._queue.get_nowait()
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            await self._flush(batch)
+            if stopping:
+                while not self._queue.empty():
+                    entry = self._queue.get_nowait()
+                    if entry is not None:
+                        await self._flush([entry])
+                return
+
+    async def _flush(self, batch: List[tuple]):
+        try:
+            results = await self._service.commit_sales_independently([sale_doc for sale_doc, _ in batch])
+        except Exception as e:
+            logger.error(f"Group commit of {len(batch)} sales failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, SaleError):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+sale_committer = SaleCommitter(SALES_GROUP_COMMIT_INTERVAL_MS, SALES_GROUP_COMMIT_BATCH_SIZE)
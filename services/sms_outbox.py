@@ -0,0 +1,228 @@
+# File: services/sms_outbox.py
+"""Persistent SMS outbox.
+
+Callers enqueue a message with a single upsert and return; a background
+worker claims due messages atomically, sends them in recipient batches
+and retries failures with backoff until they are sent or dead-lettered.
+Messages addressed to a role are sent to that role's active users as of
+the first delivery attempt.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import uuid
+
+from services.sms_service import SMSService, TwilioSMSService
+
+logger = logging.getLogger(__name__)
+
+SMS_OUTBOX_ENABLED = os.getenv("SMS_OUTBOX_ENABLED", "true").lower() == "true"
+# "africastalking" (default) or "twilio"
+SMS_PROVIDER = os.getenv("SMS_PROVIDER", "africastalking").lower()
+# New messages wait this long so a burst of identical ones coalesces into one
+SMS_OUTBOX_COALESCE_SECONDS = int(os.getenv("SMS_OUTBOX_COALESCE_SECONDS", "10"))
+SMS_OUTBOX_POLL_SECONDS = float(os.getenv("SMS_OUTBOX_POLL_SECONDS", "2"))
+SMS_OUTBOX_BATCH_SIZE = int(os.getenv("SMS_OUTBOX_BATCH_SIZE", "100"))
+SMS_OUTBOX_MAX_ATTEMPTS = int(os.getenv("SMS_OUTBOX_MAX_ATTEMPTS", "5"))
+SMS_OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("SMS_OUTBOX_RETRY_BASE_SECONDS", "30"))
+# A message claimed for longer than this is assumed lost with its worker
+SMS_OUTBOX_LEASE_SECONDS = int(os.getenv("SMS_OUTBOX_LEASE_SECONDS", "300"))
+
+# Messages queued with a kind have their text built when they are sent, by
+# the renderer registered for that kind, from the entries coalesced into them
+MESSAGE_RENDERERS: Dict[str, Callable[[Dict[str, Dict]], str]] = {}
+
+def register_renderer(kind: str, render: Callable[[Dict[str, Dict]], str]):
+    MESSAGE_RENDERERS[kind] = render
+
+class SMSOutbox:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+    async def enqueue(
+        self,
+        recipients: Optional[List[str]] = None,
+        message: Optional[str] = None,
+        coalesce_key: Optional[str] = None,
+        metadata: Optional[Dict] = None,
+        kind: Optional[str] = None,
+        entries: Optional[Dict[str, Dict]] = None,
+        roles: Optional[List[str]] = None
+    ):
+        """Queue a message for delivery; returns its outbox ID, or None if
+        the outbox is disabled.
+
+        While a message with the same coalesce_key (by default, the same
+        text) is still pending, the new one replaces its text and adds its
+        recipients and roles instead of queueing another SMS. Messages with
+        a kind instead merge their entries, keyed by ID, and are rendered
+        when sent.
+        """
+        if not SMS_OUTBOX_ENABLED:
+            # Nothing would ever send it
+            logger.warning(f"SMS outbox is disabled, dropping {kind or 'message'} SMS")
+            return None
+        now = datetime.utcnow()
+        coalesce_key = coalesce_key or kind or hashlib.sha1(message.encode()).hexdigest()
+        fields = {"updated_at": now}
+        if message is not None:
+            fields["message"] = message
+        if kind:
+            fields["kind"] = kind
+        if metadata:
+            fields["metadata"] = metadata
+        fields.update({f"entries.{key}": entry for key, entry in (entries or {}).items()})
+        update = {
+            "$set": fields,
+            "$addToSet": {"recipients": {"$each": recipients or []}, "roles": {"$each": roles or []}},
+            "$setOnInsert": {
+                "attempts": 0,
+                "created_at": now,
+                "available_at": now + timedelta(seconds=SMS_OUTBOX_COALESCE_SECONDS)
+            }
+        }
+        # The unique partial index on pending coalesce keys can reject one of
+        # two concurrent upserts; the retry then merges into the winner
+        for attempt in range(2):
+            try:
+                outbox_message = await self.db.sms_outbox.find_one_and_update(
+                    {"coalesce_key": coalesce_key, "status": "pending"},
+                    update,
+                    upsert=True,
+                    projection={"_id": 1},
+                    return_document=ReturnDocument.AFTER
+                )
+                return outbox_message["_id"]
+            except DuplicateKeyError:
+                if attempt:
+                    raise
+
+    async def claim(self, worker_id: str) -> Optional[dict]:
+        """Atomically take the next due message, or one whose worker's lease expired"""
+        now = datetime.utcnow()
+        return await self.db.sms_outbox.find_one_and_update(
+            {"$or": [
+                {"status": {"$in": ["pending", "retry"]}, "available_at": {"$lte": now}},
+                {"status": "sending", "claimed_at": {"$lt": now - timedelta(seconds=SMS_OUTBOX_LEASE_SECONDS)}}
+            ]},
+            {
+                "$set": {"status": "sending", "claimed_at": now, "claimed_by": worker_id},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def recipients(self, outbox_message: dict) -> List[str]:
+        """The message's phone numbers plus those of its roles' active users"""
+        recipients = list(outbox_message.get("recipients", []))
+        if outbox_message.get("roles"):
+            async for user in self.db.users.find(
+                {"role": {"$in": outbox_message["roles"]}, "is_active": True}, {"phone_number": 1}
+            ):
+                if user["phone_number"] not in recipients:
+                    recipients.append(user["phone_number"])
+        return recipients
+
+    async def complete(self, outbox_message: dict, results: List[Dict]):
+        await self.db.sms_outbox.update_one(
+            {"_id": outbox_message["_id"]},
+            {"$set": {"status": "sent", "sent_at": datetime.utcnow(), "results": results}}
+        )
+
+    async def fail(self, outbox_message: dict, remaining: List[str], results: List[Dict], error: str) -> str:
+        """Reschedule the undelivered recipients, or dead-letter the message; returns its new status"""
+        attempts = outbox_message["attempts"]
+        update = {"pending_recipients": remaining, "results": results, "last_error": error}
+        if attempts >= SMS_OUTBOX_MAX_ATTEMPTS:
+            update.update(status="dead", dead_at=datetime.utcnow())
+        else:
+            # Retried messages leave the pending slot so new messages can coalesce again
+            delay = random.uniform(0, SMS_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+            update.update(status="retry", available_at=datetime.utcnow() + timedelta(seconds=delay))
+        await self.db.sms_outbox.update_one({"_id": outbox_message["_id"]}, {"$set": update})
+        return update["status"]
+
+class SMSOutboxWorker:
+    def __init__(self, poll_seconds: float, batch_size: int):
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self.worker_id = uuid.uuid4().hex
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self, db: AsyncIOMotorDatabase, sms_service=None):
+        if self._task is None:
+            sms_service = sms_service or (TwilioSMSService() if SMS_PROVIDER == "twilio" else SMSService())
+            self._task = asyncio.create_task(self._run(SMSOutbox(db), sms_service))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, outbox: SMSOutbox, sms_service):
+        while True:
+            try:
+                outbox_message = await outbox.claim(self.worker_id)
+                if outbox_message is None:
+                    await asyncio.sleep(self.poll_seconds)
+                    continue
+                await self._deliver(outbox, sms_service, outbox_message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"SMS outbox worker error: {str(e)}")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _deliver(self, outbox: SMSOutbox, sms_service, outbox_message: dict):
+        # Retries only go to the recipients the earlier attempts missed
+        recipients = outbox_message.get("pending_recipients") or await outbox.recipients(outbox_message)
+        results = outbox_message.get("results", [])
+        message = outbox_message.get("message")
+        if outbox_message.get("kind"):
+            message = MESSAGE_RENDERERS[outbox_message["kind"]](outbox_message.get("entries", {}))
+        remaining, errors = [], []
+        if not recipients:
+            errors.append("no active recipients")
+        for i in range(0, len(recipients), self.batch_size):
+            batch = recipients[i:i + self.batch_size]
+            result = await sms_service.send_sms(batch, message)
+            results.append({"recipients": batch, "at": datetime.utcnow(), **result})
+            if not result.get("success"):
+                # Providers reporting per-recipient failures only resend those
+                failed = [failure["to"] for failure in result["failures"]] if result.get("failures") else batch
+                remaining.extend(failed)
+                errors.append(str(result.get("error") or result.get("failures") or "send failed"))
+
+        if not errors:
+            await outbox.complete(outbox_message, results)
+            self.sent += 1
+            return
+
+        status = await outbox.fail(outbox_message, remaining, results, "; ".join(errors))
+        if status == "dead":
+            self.dead += 1
+            logger.error(f"SMS {outbox_message['_id']} dead-lettered after {outbox_message['attempts']} attempts: {errors}")
+        else:
+            self.retried += 1
+            logger.warning(f"SMS {outbox_message['_id']} attempt {outbox_message['attempts']} failed, will retry: {errors}")
+
+    def stats(self) -> Dict:
+        return {"running": self.running, "sent": self.sent, "retried": self.retried, "dead": self.dead}
+
+sms_outbox_worker = SMSOutboxWorker(SMS_OUTBOX_POLL_SECONDS, SMS_OUTBOX_BATCH_SIZE)
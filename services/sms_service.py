@@ -1,16 +1,65 @@
 # File: services/sms_service.py
-import requests
+import httpx
+import asyncio
 import os
-from typing import List, Dict
+import random
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Dict, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+SMS_CONNECT_TIMEOUT_SECONDS = float(os.getenv("SMS_CONNECT_TIMEOUT_SECONDS", "5"))
+SMS_READ_TIMEOUT_SECONDS = float(os.getenv("SMS_READ_TIMEOUT_SECONDS", "10"))
+SMS_MAX_CONNECTIONS = int(os.getenv("SMS_MAX_CONNECTIONS", "10"))
+# Attempts after the first, on 5xx responses, timeouts and connection errors
+SMS_MAX_RETRIES = int(os.getenv("SMS_MAX_RETRIES", "3"))
+SMS_RETRY_BASE_DELAY_SECONDS = float(os.getenv("SMS_RETRY_BASE_DELAY_SECONDS", "0.5"))
+# Recipients sent to at once by TwilioSMSService
+TWILIO_MAX_CONCURRENCY = int(os.getenv("TWILIO_MAX_CONCURRENCY", "10"))
+
+class HttpClient:
+    client: Optional[httpx.AsyncClient] = None
+
+http = HttpClient()
+
+async def open_http_client():
+    """Create the shared HTTP client used for SMS gateways"""
+    if http.client is None:
+        http.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                SMS_READ_TIMEOUT_SECONDS,
+                connect=SMS_CONNECT_TIMEOUT_SECONDS,
+                pool=SMS_CONNECT_TIMEOUT_SECONDS
+            ),
+            limits=httpx.Limits(
+                max_connections=SMS_MAX_CONNECTIONS,
+                max_keepalive_connections=SMS_MAX_CONNECTIONS
+            )
+        )
+
+async def close_http_client():
+    if http.client is not None:
+        await http.client.aclose()
+        http.client = None
+
+async def get_http_client() -> httpx.AsyncClient:
+    # Scripts and jobs running outside the app get a client on first use
+    if http.client is None:
+        await open_http_client()
+    return http.client
+
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, SMS_RETRY_BASE_DELAY_SECONDS * 2 ** attempt)
+
 class SMSService:
     def __init__(self):
         self.api_key = os.getenv("AFRICASTALKING_API_KEY")
         self.username = os.getenv("AFRICASTALKING_USERNAME", "sandbox")
-        self.base_url = "https://api.africastalking.com/version1/messaging"
+        # Overridable to point at a sandbox or a local stub gateway
+        self.base_url = os.getenv("AFRICASTALKING_BASE_URL", "https://api.africastalking.com/version1/messaging")
         
     async def send_sms(self, phone_numbers: List[str], message: str) -> Dict:
         """Send SMS using Africa's Talking API"""
@@ -30,23 +79,61 @@ class SMSService:
             "message": message
         }
         
-        try:
-            response = requests.post(self.base_url, headers=headers, data=data)
-            response.raise_for_status()
-            
-            result = response.json()
-            logger.info(f"SMS sent successfully: {result}")
-            return {"success": True, "result": result}
+        client = await get_http_client()
+        for attempt in range(SMS_MAX_RETRIES + 1):
+            try:
+                response = await client.post(self.base_url, headers=headers, data=data)
+                if response.status_code < 500 or attempt == SMS_MAX_RETRIES:
+                    response.raise_for_status()
+                    result = response.json()
+                    logger.info(f"SMS sent successfully: {result}")
+                    return {"success": True, "result": result, "attempts": attempt + 1}
+                error = f"Gateway returned {response.status_code}"
+            except (httpx.TimeoutException, httpx.ConnectError) as e:
+                if attempt == SMS_MAX_RETRIES:
+                    logger.error(f"Failed to send SMS after {attempt + 1} attempts: {str(e)}")
+                    return {"success": False, "error": str(e) or type(e).__name__, "attempts": attempt + 1}
+                error = str(e) or type(e).__name__
+            except (httpx.HTTPError, ValueError) as e:
+                # 4xx responses, other transport errors and unreadable bodies are not retried
+                logger.error(f"Failed to send SMS: {str(e)}")
+                return {"success": False, "error": str(e), "attempts": attempt + 1}
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to send SMS: {str(e)}")
-            return {"success": False, "error": str(e)}
+            delay = _retry_delay(attempt)
+            logger.warning(f"SMS attempt {attempt + 1} failed ({error}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
 
 class TwilioSMSService:
+    """Twilio sends one message per recipient through its synchronous client,
+    so recipients are sent to concurrently on a dedicated thread pool"""
+    _client = None
+    _executor = ThreadPoolExecutor(max_workers=TWILIO_MAX_CONCURRENCY, thread_name_prefix="twilio-sms")
+    _semaphore: Optional[asyncio.Semaphore] = None
+
     def __init__(self):
         self.account_sid = os.getenv("TWILIO_ACCOUNT_SID")
         self.auth_token = os.getenv("TWILIO_AUTH_TOKEN")
         self.from_number = os.getenv("TWILIO_FROM_NUMBER")
+    
+    def _get_client(self):
+        # One client, and so one pooled HTTP session, shared by every send
+        if TwilioSMSService._client is None:
+            from twilio.rest import Client
+            TwilioSMSService._client = Client(self.account_sid, self.auth_token)
+        return TwilioSMSService._client
+    
+    async def _send_one(self, client, phone_number: str, message: str) -> Dict:
+        if TwilioSMSService._semaphore is None:
+            TwilioSMSService._semaphore = asyncio.Semaphore(TWILIO_MAX_CONCURRENCY)
+        async with TwilioSMSService._semaphore:
+            try:
+                message_instance = await asyncio.get_running_loop().run_in_executor(
+                    self._executor,
+                    partial(client.messages.create, body=message, from_=self.from_number, to=phone_number)
+                )
+                return {"to": phone_number, "sid": message_instance.sid}
+            except Exception as e:
+                return {"to": phone_number, "error": str(e)}
         
     async def send_sms(self, phone_numbers: List[str], message: str) -> Dict:
         """Send SMS using Twilio API"""
@@ -55,21 +142,17 @@ class TwilioSMSService:
             return {"success": False, "error": "Twilio service not configured"}
         
         try:
-            from twilio.rest import Client
-            client = Client(self.account_sid, self.auth_token)
-            
-            results = []
-            for phone_number in phone_numbers:
-                message_instance = client.messages.create(
-                    body=message,
-                    from_=self.from_number,
-                    to=phone_number
-                )
-                results.append({"to": phone_number, "sid": message_instance.sid})
-            
-            logger.info(f"SMS sent successfully via Twilio: {results}")
-            return {"success": True, "results": results}
-            
+            client = self._get_client()
         except Exception as e:
-            logger.error(f"Failed to send SMS via Twilio: {str(e)}")
+            logger.error(f"Failed to create Twilio client: {str(e)}")
             return {"success": False, "error": str(e)}
+        
+        outcomes = await asyncio.gather(*(self._send_one(client, phone_number, message) for phone_number in phone_numbers))
+        results = [outcome for outcome in outcomes if "sid" in outcome]
+        failures = [outcome for outcome in outcomes if "error" in outcome]
+        
+        if failures:
+            logger.error(f"Failed to send SMS via Twilio to {len(failures)} of {len(outcomes)} recipients: {failures}")
+        if results:
+            logger.info(f"SMS sent successfully via Twilio: {results}")
+        return {"success": not failures, "results": results, "failures": failures}
@@ -0,0 +1,82 @@
+# File: services/stock_state.py
+"""Denormalized stock state of items: "ok", "low" or "out".
+
+Every write that changes current_stock or alert_threshold also sets
+stock_state, using an update pipeline so both are computed from the same
+document version. Low stock listings then query stock_state through a
+partial index instead of comparing the two fields on every item. Items
+written before the field existed are backfilled at startup; to recompute
+every item's state by hand:
+
+    python -m services.stock_state backfill
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+STOCK_OK = "ok"
+STOCK_LOW = "low"
+STOCK_OUT = "out"
+# Out of stock items are also at or below their alert threshold
+LOW_STOCK_STATES = [STOCK_LOW, STOCK_OUT]
+LOW_STOCK_QUERY = {"stock_state": {"$in": LOW_STOCK_STATES}}
+
+STOCK_STATE = {"$switch": {
+    "branches": [
+        {"case": {"$lte": ["$current_stock", 0]}, "then": STOCK_OUT},
+        {"case": {"$lte": ["$current_stock", "$alert_threshold"]}, "then": STOCK_LOW}
+    ],
+    "default": STOCK_OK
+}}
+
+# Items back above their threshold can be alerted on again when they next go low
+CLEAR_LOW_STOCK_ALERTED = {"$cond": [{"$eq": ["$stock_state", STOCK_OK]}, None, "$low_stock_alerted_at"]}
+
+def stock_state(current_stock: int, alert_threshold: int) -> str:
+    if current_stock <= 0:
+        return STOCK_OUT
+    if current_stock <= alert_threshold:
+        return STOCK_LOW
+    return STOCK_OK
+
+def stock_update(values: Dict, expressions: Optional[Dict] = None) -> List[Dict]:
+    """Update pipeline that sets the given values and aggregation
+    expressions, then recomputes stock_state"""
+    return [
+        {"$set": {
+            **{field: {"$literal": value} for field, value in values.items()},
+            **(expressions or {})
+        }},
+        {"$set": {"stock_state": STOCK_STATE}},
+        {"$set": {"low_stock_alerted_at": CLEAR_LOW_STOCK_ALERTED}}
+    ]
+
+async def backfill(db: AsyncIOMotorDatabase, missing_only: bool = False) -> int:
+    """Recompute stock_state of every item, or only of items that have none;
+    returns the number of items changed"""
+    result = await db.items.update_many({"stock_state": {"$exists": False}} if missing_only else {}, [
+        {"$set": {"stock_state": STOCK_STATE}},
+        {"$set": {"low_stock_alerted_at": CLEAR_LOW_STOCK_ALERTED}}
+    ])
+    return result.modified_count
+
+async def _main() -> int:
+    from models.database import connect_to_mongo, close_mongo_connection, get_database
+
+    await connect_to_mongo(ensure_indexes=False)
+    try:
+        changed = await backfill(await get_database())
+        print(f"Updated stock_state of {changed} items")
+        return 0
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] != "backfill":
+        print("usage: python -m services.stock_state backfill")
+        sys.exit(2)
+    sys.exit(asyncio.run(_main()))
@@ -661,7 +661,53 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    
+
+    // Live Manager Dashboard (Server-Sent Events)
+    const liveDashboard = document.getElementById('live-dashboard');
+    if (liveDashboard && window.EventSource) {
+        const totalSalesEl = document.getElementById('live-total-sales');
+        const transactionsEl = document.getElementById('live-transactions');
+        const lowStockList = document.getElementById('live-low-stock');
+        const feedbackList = document.getElementById('live-feedback');
+        const lowStock = new Map();
+
+        const showTotals = (data) => {
+            totalSalesEl.textContent = Number(data.total_sales).toFixed(2);
+            transactionsEl.textContent = data.total_transactions;
+        };
+        const showLowStock = () => {
+            lowStockList.innerHTML = '';
+            lowStock.forEach(item => {
+                const li = document.createElement('li');
+                li.textContent = `${item.name}: ${item.current_stock} left (alert at ${item.alert_threshold})`;
+                lowStockList.appendChild(li);
+            });
+        };
+
+        const source = new EventSource('/dashboard/stream');
+        source.addEventListener('snapshot', (e) => {
+            const data = JSON.parse(e.data);
+            showTotals(data);
+            lowStock.clear();
+            data.low_stock_items.forEach(item => lowStock.set(item.item_id, item));
+            showLowStock();
+        });
+        source.addEventListener('sales', (e) => showTotals(JSON.parse(e.data)));
+        source.addEventListener('low_stock', (e) => {
+            const data = JSON.parse(e.data);
+            data.items.forEach(item => lowStock.set(item.item_id, item));
+            data.restocked.forEach(itemId => lowStock.delete(itemId));
+            showLowStock();
+        });
+        source.addEventListener('feedback', (e) => {
+            const data = JSON.parse(e.data);
+            const li = document.createElement('li');
+            li.textContent = `${data.feedback_type}: ${data.description}`;
+            feedbackList.prepend(li);
+            while (feedbackList.children.length > 10) feedbackList.lastChild.remove();
+        });
+    }
+
     // Logout
      const logoutLinks = document.querySelectorAll('a[href="/logout"]');
      logoutLinks.forEach(link => {
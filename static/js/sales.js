@@ -252,6 +252,21 @@
             }
         });
 
+        // Reset form to its default state after a sale
+        const resetSaleForm = () => {
+            salesForm.reset();
+            document.getElementById('sale-items-tbody').innerHTML = '';
+            
+            // Reset to default state (amount paid visible for cash - default payment method)
+            document.getElementById('amount-paid-group').style.display = 'block';
+            document.getElementById('mpesa-reference-group').style.display = 'none';
+            document.getElementById('change-display').style.display = 'none';
+            
+            updateTotals();
+            
+            setTimeout(() => clearMessages(), 5000);
+        };
+
         // Form submission
         salesForm.addEventListener('submit', async (e) => {
             e.preventDefault();
@@ -277,6 +292,9 @@
                     payment_method: paymentMethod,
                     customer_name: formData.get('customer_name') || '',
                     discount_percentage: parseFloat(formData.get('discount_percentage')) || 0,
+                    // Same key on the first attempt and any offline retry, so a sale
+                    // the server recorded before the connection dropped is not recorded twice
+                    idempotency_key: crypto.randomUUID(),
                 };
                 
                 // Add payment-specific data
@@ -286,14 +304,23 @@
                     data.mpesa_reference = formData.get('mpesa_reference') || '';
                 }
                 
-                const response = await fetch('/sales', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                        'Authorization': `Bearer ${token}`
-                    },
-                    body: JSON.stringify(data)
-                });
+                let response;
+                try {
+                    response = await fetch('/sales', {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/json',
+                            'Authorization': `Bearer ${token}`
+                        },
+                        body: JSON.stringify(data)
+                    });
+                } catch (networkError) {
+                    // No connection: keep the sale and sync it later
+                    const pending = queueOfflineSale(data);
+                    successEl.textContent = `Offline: sale saved and will sync when the connection returns (${pending} pending)`;
+                    resetSaleForm();
+                    return;
+                }
                 
                 const result = await response.json();
                 
@@ -303,22 +330,10 @@
                         successMessage += ` | Change: $${result.change.toFixed(2)}`;
                     }
                     successEl.textContent = successMessage;
-                    
-                    // Reset form
-                    salesForm.reset();
-                    document.getElementById('sale-items-tbody').innerHTML = '';
-                    
-                    // Reset to default state (amount paid visible for cash - default payment method)
-                    document.getElementById('amount-paid-group').style.display = 'block';
-                    document.getElementById('mpesa-reference-group').style.display = 'none';
-                    document.getElementById('change-display').style.display = 'none';
-                    
-                    updateTotals();
+                    resetSaleForm();
                     
                     // Refresh sales history
                     fetchSalesHistory();
-                    
-                    setTimeout(() => clearMessages(), 5000);
                 } else {
                     throw new Error(result.detail || 'Failed to record sale');
                 }
@@ -330,6 +345,76 @@
         });
     };
 
+    // Sales recorded while offline, synced through /sales/batch on reconnect
+    const OFFLINE_QUEUE_KEY = 'offlineSales';
+    const OFFLINE_BATCH_SIZE = 500;
+
+    // Offline sales the server rejected; they happened at the till, so they
+    // are kept for a manager to review instead of being discarded
+    const REJECTED_SALES_KEY = 'offlineSalesNeedsReview';
+
+    const getOfflineSales = () => JSON.parse(localStorage.getItem(OFFLINE_QUEUE_KEY) || '[]');
+    const getRejectedSales = () => JSON.parse(localStorage.getItem(REJECTED_SALES_KEY) || '[]');
+
+    const queueOfflineSale = (data) => {
+        const queue = getOfflineSales();
+        queue.push({ ...data, sold_at: new Date().toISOString() });
+        localStorage.setItem(OFFLINE_QUEUE_KEY, JSON.stringify(queue));
+        return queue.length;
+    };
+
+    const syncOfflineSales = async () => {
+        const batch = getOfflineSales().slice(0, OFFLINE_BATCH_SIZE);
+        if (batch.length === 0) return;
+        try {
+            const response = await fetch('/sales/batch', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': `Bearer ${token}`
+                },
+                body: JSON.stringify({ sales: batch })
+            });
+            if (!response.ok) {
+                throw new Error(`HTTP error! Status: ${response.status}`);
+            }
+            const result = await response.json();
+            
+            // Every sale in the batch has a final answer, so drop them from the queue;
+            // retrying is safe because the server ignores keys it has already seen.
+            // Rejected sales move to the needs-review list first.
+            const synced = new Set(result.results.map(r => r.idempotency_key));
+            const rejected = new Map(
+                result.results.filter(r => r.status === 'rejected').map(r => [r.idempotency_key, r.detail])
+            );
+            const queue = getOfflineSales();
+            if (rejected.size > 0) {
+                const review = getRejectedSales();
+                const reviewKeys = new Set(review.map(sale => sale.idempotency_key));
+                queue.filter(sale => rejected.has(sale.idempotency_key) && !reviewKeys.has(sale.idempotency_key))
+                    .forEach(sale => review.push({
+                        ...sale,
+                        rejected_reason: rejected.get(sale.idempotency_key),
+                        rejected_at: new Date().toISOString()
+                    }));
+                localStorage.setItem(REJECTED_SALES_KEY, JSON.stringify(review));
+            }
+            const remaining = queue.filter(sale => !synced.has(sale.idempotency_key));
+            localStorage.setItem(OFFLINE_QUEUE_KEY, JSON.stringify(remaining));
+            
+            const needsReview = getRejectedSales();
+            if (needsReview.length > 0 && errorEl) {
+                errorEl.textContent = `${needsReview.length} offline sale(s) need review: ${needsReview.map(sale => sale.rejected_reason).join('; ')}`;
+            }
+            fetchSalesHistory();
+            if (remaining.length > 0) {
+                syncOfflineSales();
+            }
+        } catch (error) {
+            console.error('Error syncing offline sales:', error);
+        }
+    };
+
     // Fetch and display sales history
     const fetchSalesHistory = async () => {
         const salesList = document.getElementById('sales-list');
@@ -350,7 +435,7 @@
                 }
                 const salesData = await response.json();
                 salesList.innerHTML = '';
-                salesData.forEach(sale => {
+                salesData.sales.forEach(sale => {
                     const itemsStr = sale.items.map(item => `${item.item_name} (${item.quantity})`).join(', ');
                     const row = document.createElement('tr');
                     row.innerHTML = `
@@ -382,5 +467,7 @@
     if (document.getElementById('sales-form')) {
         initSalesForm();
         fetchSalesHistory();
+        syncOfflineSales();
+        window.addEventListener('online', syncOfflineSales);
     }
 })();
\ No newline at end of file
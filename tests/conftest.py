@@ -0,0 +1,106 @@
+# File: tests/conftest.py
+"""Shared fixtures: an in-memory Motor database and the API wired to it.
+
+Tests run against mongomock-motor, so they need no MongoDB server:
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+"""
+from bson import ObjectId
+from datetime import datetime
+from fastapi import FastAPI
+from mongomock_motor import AsyncMongoMockClient, AsyncCursor, AsyncCommandCursor
+import asyncio
+import functools
+import httpx
+import pytest
+
+from models.database import get_database
+from models.indexes import ensure_indexes
+from routers import auth, inventory, sales
+from services.catalog_cache import catalog_cache
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+COLLECTION_METHODS = [
+    "bulk_write", "count_documents", "delete_many", "delete_one", "find_one",
+    "find_one_and_update", "insert_many", "insert_one", "update_many", "update_one"
+]
+CURSOR_METHODS = ["next", "__anext__", "to_list"]
+
+def _round_trip(method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        await asyncio.sleep(0)
+        return await method(*args, **kwargs)
+    return wrapper
+
+@pytest.fixture
+async def db(monkeypatch):
+    """In-memory database whose calls suspend like a driver round trip.
+
+    mongomock answers without ever yielding to the event loop, so concurrent
+    requests would otherwise run one after another and never race.
+    """
+    catalog_cache.invalidate()
+    database = AsyncMongoMockClient()["smartbiz_test"]
+    for cls, methods in [(type(database.items), COLLECTION_METHODS), (AsyncCursor, CURSOR_METHODS), (AsyncCommandCursor, CURSOR_METHODS)]:
+        for name in methods:
+            monkeypatch.setattr(cls, name, _round_trip(getattr(cls, name)))
+    # Unique indexes back idempotent sales
+    await ensure_indexes(database)
+    return database
+
+@pytest.fixture
+def manager():
+    return {
+        "_id": ObjectId(),
+        "full_name": "Test Manager",
+        "id_number": "12345678",
+        "phone_number": "0712345678",
+        "role": "manager",
+        "is_active": True
+    }
+
+@pytest.fixture
+def app(db, manager):
+    app = FastAPI()
+    app.include_router(inventory.router)
+    app.include_router(sales.router)
+
+    async def _database():
+        return db
+
+    async def _user():
+        return manager
+
+    app.dependency_overrides[get_database] = _database
+    app.dependency_overrides[auth.get_current_user_from_cookie] = _user
+    app.dependency_overrides[auth.get_manager_user_from_cookie] = _user
+    return app
+
+@pytest.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+@pytest.fixture
+def make_item(db):
+    """Insert an item and return its ID"""
+    async def _make_item(name: str, current_stock: int, selling_price: float = 10.0, alert_threshold: int = 0) -> ObjectId:
+        result = await db.items.insert_one({
+            "name": name,
+            "custom_id": name.upper(),
+            "category": "General",
+            "selling_price": selling_price,
+            "buying_price": selling_price / 2,
+            "current_stock": current_stock,
+            "alert_threshold": alert_threshold,
+            "stock_state": "ok",
+            "supplier_prices": [],
+            "created_at": datetime.utcnow()
+        })
+        return result.inserted_id
+    return _make_item
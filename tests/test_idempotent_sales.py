@@ -0,0 +1,35 @@
+# File: tests/test_idempotent_sales.py
+"""Retried sales are recorded once, without a lookup before the commit"""
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+def _sale(item_id, key):
+    return {
+        "items": [{"item_id": str(item_id), "quantity": 2, "unit_price": 10.0}],
+        "payment_method": "cash",
+        "idempotency_key": key
+    }
+
+async def test_retry_returns_the_recorded_sale(client, db, make_item):
+    item_id = await make_item("Bread", current_stock=10)
+
+    first = await client.post("/sales", json=_sale(item_id, "till-1-0001"))
+    retry = await client.post("/sales", json=_sale(item_id, "till-1-0001"))
+
+    assert first.json()["message"] == "Sale recorded successfully"
+    assert retry.json()["message"] == "Sale already recorded"
+    assert retry.json()["sale_id"] == first.json()["sale_id"]
+    assert await db.sales.count_documents({}) == 1
+    assert (await db.items.find_one({"_id": item_id}))["current_stock"] == 8
+
+async def test_concurrent_retries_record_one_sale(client, db, make_item):
+    item_id = await make_item("Milk", current_stock=100)
+
+    responses = await asyncio.gather(*[client.post("/sales", json=_sale(item_id, "till-2-0001")) for _ in range(10)])
+
+    assert all(response.status_code == 200 for response in responses)
+    assert len({response.json()["sale_id"] for response in responses}) == 1
+    assert await db.sales.count_documents({}) == 1
+    assert (await db.items.find_one({"_id": item_id}))["current_stock"] == 98
@@ -0,0 +1,95 @@
+# File: tests/test_low_stock_alerts.py
+"""Sales that take an item to its threshold queue one low stock alert"""
+from bson import ObjectId
+from datetime import datetime
+import pytest
+
+from services import sms_outbox
+from services.alert_service import AlertService
+from services.sms_outbox import SMSOutbox, SMSOutboxWorker
+
+pytestmark = pytest.mark.anyio
+
+def _sale(item_id, quantity):
+    return {
+        "items": [{"item_id": str(item_id), "quantity": quantity, "unit_price": 10.0}],
+        "payment_method": "cash"
+    }
+
+async def test_crossing_alerts_once_from_the_decrement(client, db, make_item, manager):
+    await db.users.insert_one(manager)
+    item_id = await make_item("Bread", current_stock=5, alert_threshold=3)
+
+    assert (await client.post("/sales", json=_sale(item_id, 1))).status_code == 200
+    assert await db.sms_outbox.count_documents({}) == 0
+
+    finds = []
+    original_find = type(db.items).find
+
+    def counting_find(collection, *args, **kwargs):
+        if collection.name == "items":
+            finds.append(args)
+        return original_find(collection, *args, **kwargs)
+
+    type(db.items).find = counting_find
+    try:
+        assert (await client.post("/sales", json=_sale(item_id, 2))).status_code == 200
+        assert (await client.post("/sales", json=_sale(item_id, 1))).status_code == 200
+    finally:
+        type(db.items).find = original_find
+
+    # Only the catalog lookup of each sale reads items; levels come from the decrement
+    assert len(finds) == 2
+    item = await db.items.find_one({"_id": item_id})
+    assert item["stock_state"] == "low"
+    assert item["low_stock_alerted_at"] is not None
+    outbox = await db.sms_outbox.find({}).to_list(None)
+    assert len(outbox) == 1
+    assert list(outbox[0]["entries"]) == [str(item_id)]
+
+async def test_restock_rearms_the_alert(client, db, make_item, manager):
+    await db.users.insert_one(manager)
+    item_id = await make_item("Milk", current_stock=4, alert_threshold=3)
+
+    await client.post("/sales", json=_sale(item_id, 1))
+    await client.post("/inventory/items/MILK/stock-adjustment", json={"type": "increase", "quantity": 10})
+    assert (await db.items.find_one({"_id": item_id}))["low_stock_alerted_at"] is None
+
+    await client.post("/sales", json=_sale(item_id, 10))
+    assert (await db.items.find_one({"_id": item_id}))["low_stock_alerted_at"] is not None
+
+class RecordingSMS:
+    def __init__(self):
+        self.sent = []
+
+    async def send_sms(self, phone_numbers, message):
+        self.sent.append(list(phone_numbers))
+        return {"success": True}
+
+async def test_worker_resolves_managers_when_sending(client, db, make_item, manager):
+    item_id = await make_item("Sugar", current_stock=2, alert_threshold=3)
+    await client.post("/sales", json=_sale(item_id, 1))
+    outbox_message = await db.sms_outbox.find_one({})
+    assert outbox_message["roles"] == ["manager"] and outbox_message["recipients"] == []
+
+    # Managers added after the alert was queued still receive it
+    await db.users.insert_one(manager)
+    await db.users.insert_one({
+        **manager, "_id": ObjectId(), "id_number": "87654321", "phone_number": "0700000000", "is_active": False
+    })
+    outbox = SMSOutbox(db)
+    await db.sms_outbox.update_one({"_id": outbox_message["_id"]}, {"$set": {"available_at": datetime.utcnow()}})
+    sms = RecordingSMS()
+    await SMSOutboxWorker(poll_seconds=0, batch_size=10)._deliver(outbox, sms, await outbox.claim("test"))
+
+    assert sms.sent == [[manager["phone_number"]]]
+    assert (await db.sms_outbox.find_one({}))["status"] == "sent"
+
+async def test_disabled_outbox_refuses_alerts(client, db, make_item, monkeypatch):
+    monkeypatch.setattr(sms_outbox, "SMS_OUTBOX_ENABLED", False)
+    item_id = await make_item("Salt", current_stock=2, alert_threshold=3)
+
+    result = await AlertService(db).send_low_stock_alerts([{"item_id": str(item_id), "name": "Salt"}])
+
+    assert result["success"] is False
+    assert await db.sms_outbox.count_documents({}) == 0
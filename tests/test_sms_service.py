@@ -0,0 +1,101 @@
+# File: tests/test_sms_service.py
+"""SMSService against a stub gateway: retries, and a responsive event loop"""
+import asyncio
+import httpx
+import pytest
+import time
+
+from services import sms_service
+from services.sms_service import SMSService
+
+pytestmark = pytest.mark.anyio
+
+GATEWAY_DELAY_SECONDS = 0.05
+OK = {"SMSMessageData": {"Message": "Sent to 1/1", "Recipients": [{"status": "Success"}]}}
+
+class StubGateway:
+    """Answers requests with the scripted statuses in turn, repeating the
+    last one; exceptions in the script are raised instead"""
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        await asyncio.sleep(GATEWAY_DELAY_SECONDS)
+        response = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if isinstance(response, Exception):
+            raise response
+        return httpx.Response(response, json=OK if response < 400 else {"error": "unavailable"})
+
+@pytest.fixture
+async def gateway(monkeypatch):
+    """Install a stub gateway as the shared HTTP client"""
+    monkeypatch.setenv("AFRICASTALKING_API_KEY", "test-key")
+    monkeypatch.setattr(sms_service, "SMS_RETRY_BASE_DELAY_SECONDS", 0.01)
+    clients = []
+
+    def install(*responses):
+        stub = StubGateway(*responses)
+        client = httpx.AsyncClient(transport=httpx.MockTransport(stub))
+        clients.append(client)
+        monkeypatch.setattr(sms_service.http, "client", client)
+        return stub
+
+    yield install
+    for client in clients:
+        await client.aclose()
+
+async def _max_loop_stall(task: asyncio.Task, interval: float = 0.005) -> float:
+    """Longest delay, in seconds, of a timer ticking until task is done"""
+    worst = 0.0
+    while not task.done():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+async def test_retries_server_errors_until_sent(gateway):
+    stub = gateway(503, 502, 200)
+
+    result = await SMSService().send_sms(["+254712345678"], "Low stock: Bread")
+
+    assert result["success"] is True
+    assert result["attempts"] == 3
+    assert len(stub.requests) == 3
+    assert stub.requests[0].headers["apiKey"] == "test-key"
+
+async def test_retries_timeouts(gateway):
+    stub = gateway(httpx.ReadTimeout("gateway too slow"), 200)
+
+    result = await SMSService().send_sms(["+254712345678"], "Low stock: Bread")
+
+    assert result["success"] is True
+    assert len(stub.requests) == 2
+
+async def test_gives_up_after_max_retries(gateway):
+    stub = gateway(503)
+
+    result = await SMSService().send_sms(["+254712345678"], "Low stock: Bread")
+
+    assert result["success"] is False
+    assert len(stub.requests) == sms_service.SMS_MAX_RETRIES + 1
+
+async def test_client_errors_are_not_retried(gateway):
+    stub = gateway(401)
+
+    result = await SMSService().send_sms(["+254712345678"], "Low stock: Bread")
+
+    assert result["success"] is False
+    assert len(stub.requests) == 1
+
+async def test_event_loop_keeps_running_during_sends(gateway):
+    stub = gateway(503, 503, 200)
+
+    send = asyncio.ensure_future(SMSService().send_sms(["+254712345678"], "Low stock: Bread"))
+    stall = await _max_loop_stall(send)
+
+    assert (await send)["success"] is True
+    assert len(stub.requests) == 3
+    # Three slow gateway answers plus backoff took far longer than any stall
+    assert stall < GATEWAY_DELAY_SECONDS
@@ -0,0 +1,70 @@
+# File: tests/test_stock_reservation.py
+"""Concurrent tills selling the same item never take its stock below zero"""
+import asyncio
+import pytest
+
+from services.sales_service import SaleCommitter
+
+pytestmark = pytest.mark.anyio
+
+TILLS = 50
+
+def _sale(*lines):
+    return {
+        "items": [{"item_id": str(item_id), "quantity": quantity, "unit_price": 10.0} for item_id, quantity in lines],
+        "payment_method": "cash"
+    }
+
+async def _sell_concurrently(client, sales):
+    return await asyncio.gather(*[client.post("/sales", json=sale) for sale in sales])
+
+@pytest.fixture(params=["direct", "group_commit"])
+async def mode(request, db, monkeypatch):
+    """Run each test with sales committed per request and through group commit"""
+    if request.param == "direct":
+        yield request.param
+        return
+    committer = SaleCommitter(flush_interval_ms=2, batch_size=16)
+    monkeypatch.setattr("routers.sales.sale_committer", committer)
+    committer.start(db)
+    yield request.param
+    await committer.stop()
+
+async def test_parallel_sales_never_oversell(mode, client, db, make_item):
+    item_id = await make_item("Bread", current_stock=30)
+
+    responses = await _sell_concurrently(client, [_sale((item_id, 1)) for _ in range(TILLS)])
+
+    recorded = [response for response in responses if response.status_code == 200]
+    rejected = [response for response in responses if response.status_code == 400]
+    assert len(recorded) == 30
+    assert len(rejected) == TILLS - 30
+    assert all("Insufficient stock" in response.json()["detail"] for response in rejected)
+    item = await db.items.find_one({"_id": item_id})
+    assert item["current_stock"] == 0
+    assert await db.sales.count_documents({}) == 30
+
+async def test_parallel_multi_unit_sales_never_oversell(mode, client, db, make_item):
+    item_id = await make_item("Milk", current_stock=100)
+
+    responses = await _sell_concurrently(client, [_sale((item_id, 3)) for _ in range(TILLS)])
+
+    recorded = sum(1 for response in responses if response.status_code == 200)
+    item = await db.items.find_one({"_id": item_id})
+    assert recorded == 33
+    assert item["current_stock"] == 100 - 3 * recorded
+    assert item["current_stock"] >= 0
+    assert await db.sales.count_documents({}) == recorded
+
+async def test_short_line_rolls_back_whole_sale(mode, client, db, make_item):
+    bread = await make_item("Bread", current_stock=50)
+    milk = await make_item("Milk", current_stock=10)
+
+    # Every sale takes one bread, but only ten can also get their milk
+    responses = await _sell_concurrently(client, [_sale((bread, 1), (milk, 1)) for _ in range(TILLS)])
+
+    recorded = sum(1 for response in responses if response.status_code == 200)
+    assert recorded == 10
+    assert (await db.items.find_one({"_id": milk}))["current_stock"] == 0
+    assert (await db.items.find_one({"_id": bread}))["current_stock"] == 50 - recorded
+    assert await db.sales.count_documents({}) == recorded
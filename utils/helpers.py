@@ -1,7 +1,11 @@
 # File: utils/helpers.py
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from bson import ObjectId
+import base64
 import calendar
+import json
 
 class DateHelper:
     @staticmethod
@@ -27,6 +31,98 @@ class DateHelper:
         end_of_month = date.replace(day=last_day, hour=23, minute=59, second=59, microsecond=999999)
         
         return start_of_month, end_of_month
+    
+    GRANULARITIES = ("hour", "day", "week", "month")
+    
+    @staticmethod
+    def get_timezone(name: str) -> ZoneInfo:
+        """IANA timezone by name, e.g. "Africa/Nairobi" """
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone: {name}")
+    
+    @staticmethod
+    def to_utc(date: datetime) -> datetime:
+        """Naive UTC datetime, as stored in the database"""
+        if date.tzinfo:
+            return date.astimezone(timezone.utc).replace(tzinfo=None)
+        return date
+    
+    @staticmethod
+    def truncate(date: datetime, granularity: str, tz: ZoneInfo) -> datetime:
+        """Start of the local hour/day/week/month containing date.
+
+        Naive dates are taken as local time in tz; weeks start on Monday.
+        """
+        local = date.astimezone(tz) if date.tzinfo else date.replace(tzinfo=tz)
+        if granularity == "hour":
+            return local.replace(minute=0, second=0, microsecond=0)
+        day = datetime(local.year, local.month, local.day, tzinfo=tz)
+        if granularity == "day":
+            return day
+        if granularity == "week":
+            return day - timedelta(days=day.weekday())
+        if granularity == "month":
+            return day.replace(day=1)
+        raise ValueError(f"Granularity must be one of {', '.join(DateHelper.GRANULARITIES)}")
+    
+    @staticmethod
+    def next_bucket(start: datetime, granularity: str) -> datetime:
+        """Start of the bucket following the one starting at start"""
+        if granularity == "hour":
+            # Step in UTC so DST transitions neither skip nor repeat an hour
+            return (start.astimezone(timezone.utc) + timedelta(hours=1)).astimezone(start.tzinfo)
+        if granularity == "day":
+            return start + timedelta(days=1)
+        if granularity == "week":
+            return start + timedelta(weeks=1)
+        year, month = divmod(start.month, 12)
+        return start.replace(year=start.year + year, month=month + 1)
+    
+    @staticmethod
+    def get_buckets(
+        start: datetime,
+        end: datetime,
+        granularity: str,
+        tz: ZoneInfo,
+        max_buckets: Optional[int] = None
+    ) -> List[datetime]:
+        """Local start times of every bucket from the one containing start to the one containing end"""
+        buckets = []
+        bucket = DateHelper.truncate(start, granularity, tz)
+        last = DateHelper.truncate(end, granularity, tz)
+        while bucket <= last:
+            if max_buckets is not None and len(buckets) == max_buckets:
+                raise ValueError(f"Range spans more than {max_buckets} {granularity} buckets")
+            buckets.append(bucket)
+            bucket = DateHelper.next_bucket(bucket, granularity)
+        return buckets
+
+class KeysetCursor:
+    """Opaque cursors for newest-first pagination on (created_at, _id)"""
+    @staticmethod
+    def encode(document: Dict) -> str:
+        """Cursor pointing just past the given document"""
+        raw = json.dumps({"t": document["created_at"].isoformat(), "id": str(document["_id"])})
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+    
+    @staticmethod
+    def decode(cursor: str) -> tuple:
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(raw["t"]), ObjectId(raw["id"])
+        except Exception:
+            raise ValueError("Invalid cursor")
+    
+    @staticmethod
+    def after(cursor: str) -> Dict:
+        """Filter selecting the documents that follow the cursor"""
+        created_at, _id = KeysetCursor.decode(cursor)
+        return {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": _id}}
+        ]}
 
 class ProfitCalculator:
     @staticmethod
@@ -49,14 +145,19 @@ class ProfitCalculator:
         """Calculate daily profit from sales and expenses"""
         total_revenue = sum(sale.get("final_amount", 0) for sale in sales_data)
         total_expenses = sum(expense.get("amount", 0) for expense in expenses)
+        # Unit costs are snapshotted on each sale line when the sale is made;
+        # lines sold without a known cost are counted separately
+        lines = [line for sale in sales_data for line in sale.get("items", [])]
+        cost_of_goods_sold = sum(line["quantity"] * (line.get("unit_cost") or 0) for line in lines)
+        uncosted_quantity = sum(line["quantity"] for line in lines if line.get("unit_cost") is None)
         
-        # Note: This is a simplified calculation
-        # For accurate profit, you'd need cost of goods sold
-        gross_profit = total_revenue  # Simplified - needs actual COGS calculation
+        gross_profit = total_revenue - cost_of_goods_sold
         net_profit = gross_profit - total_expenses
         
         return {
             "total_revenue": total_revenue,
+            "cost_of_goods_sold": cost_of_goods_sold,
+            "uncosted_quantity": uncosted_quantity,
             "total_expenses": total_expenses,
             "gross_profit": gross_profit,
             "net_profit": net_profit,